@@ -0,0 +1,109 @@
+# circuit_breaker.py
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    Tracks consecutive deployment failures of one server.
+
+    After fail_threshold failures in a row the circuit opens and deployments
+    to the server are skipped. Once recovery_s seconds have passed, one
+    deployment is let through (half-open): success closes the circuit again,
+    failure reopens it for another recovery_s. A half-open trial that never
+    reports back doesn't block the server: after another recovery_s the next
+    deployment is let through as a new trial.
+
+    Failures may name the pushed commit (head). A deployment of a different
+    commit is always let through as a trial, so a push that may fix the
+    problem isn't skipped; only repeats of the failed commit are.
+    """
+
+    def __init__(self, fail_threshold: int = 5, recovery_s: float = 60):
+        self.fail_threshold = fail_threshold
+        self.recovery_s = recovery_s
+        self.state = CLOSED
+        self.fail_count = 0
+        self.opened_at = 0.0
+        self.failed_head = None
+        self._lock = threading.Lock()
+
+    def allow(self, head: str = None) -> bool:
+        """
+        Returns True if a deployment may run now. Moves an open circuit whose
+        recovery time has passed, or that is asked about a commit other than
+        the failed one, to half-open and lets that one attempt through.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = time.monotonic()
+            new_head = head is not None and head != self.failed_head
+            if new_head or now - self.opened_at >= self.recovery_s:
+                self.state = HALF_OPEN
+                # Restarts the clock, so a trial that never reports back expires.
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.fail_count = 0
+            self.failed_head = None
+
+    def record_failure(self, head: str = None):
+        with self._lock:
+            self.fail_count += 1
+            self.failed_head = head
+            if self.state == HALF_OPEN or self.fail_count >= self.fail_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def trip(self, head: str = None):
+        """
+        Opens the circuit right away, for failures that retrying won't fix.
+        """
+        with self._lock:
+            self.fail_count += 1
+            self.failed_head = head
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, round(self.recovery_s - (time.monotonic() - self.opened_at), 1))
+            return {"state": self.state, "fail_count": self.fail_count, "retry_in": retry_in,
+                    "failed_head": self.failed_head}
+
+
+# (repo_name, server_key) -> CircuitBreaker
+_BREAKERS = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_breaker(repo_name: str, server_key: str) -> CircuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get((repo_name, server_key))
+        if breaker is None:
+            breaker = _BREAKERS[(repo_name, server_key)] = CircuitBreaker()
+        return breaker
+
+
+def circuit_states() -> dict:
+    """
+    Returns the state of every tracked server as {"repo/serverN": {...}}.
+    """
+    with _BREAKERS_LOCK:
+        breakers = list(_BREAKERS.items())
+    return {f"{repo_name}/{server_key}": breaker.snapshot() for (repo_name, server_key), breaker in breakers}
@@ -1,28 +1,111 @@
 # config.py
 
 import os
-import yaml
+import tempfile
+import threading
+import time
 import logging
+import orjson
+from functools import lru_cache
+from types import MappingProxyType
+from pydantic import ValidationError
+
+from models.server_config import ServerConfig
+from models.settings import Settings
 
 logger = logging.getLogger(__name__)
 
+# Snapshot of the process environment, taken once at import.
+_ENV = dict(os.environ)
+
+_CONFIG_PATH = _ENV.get("CONFIG_PATH", "config.yaml")
+
+# (environment variable, email setting) pairs applied on top of the YAML email section.
+_EMAIL_ENV_OVERRIDES = (
+    ("EMAIL_PASSWORD", "password"),
+    ("EMAIL_USERNAME", "username"),
+    ("SMTP_SERVER", "smtp_server"),
+)
+
+
+def _read_config_cache(cache_path: str, src_mtime: int):
+    """
+    Returns the parsed config stored in the sidecar cache if it was written
+    for the current mtime of the source file, otherwise None.
+    """
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = orjson.loads(f.read())
+        cached_mtime, cached_config = cached["mtime"], cached["config"]
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.debug(f"Ignoring unreadable config cache '{cache_path}': {e}")
+        return None
+
+    if cached_mtime != src_mtime or not isinstance(cached_config, dict):
+        return None
+    return cached_config
+
+
+def _write_config_cache(cache_path: str, src_mtime: int, config: dict):
+    """
+    Atomically writes the parsed config next to the source file as JSON.
+    Failures are not fatal (e.g. read-only filesystem); the YAML is simply
+    parsed next time. Configs JSON can't round-trip (non-string keys, dates,
+    binary values) raise here and are never cached.
+    """
+    cache_dir = os.path.dirname(cache_path) or "."
+    try:
+        data = orjson.dumps({"mtime": src_mtime, "config": config}, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=".config-cache-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        logger.debug(f"Could not write config cache '{cache_path}': {e}")
+
 
 def load_config():
     """
     Load configuration from the YAML file specified by CONFIG_PATH
     environment variable or the default path.
+
+    The parsed result is cached in a '<CONFIG_PATH>.cache.json' sidecar and
+    reused as long as the YAML file's mtime is unchanged.
     """
-    CONFIG_PATH = os.getenv("CONFIG_PATH", "config.yaml")
+    CONFIG_PATH = _CONFIG_PATH
 
-    if not os.path.exists(CONFIG_PATH):
+    # A single stat both checks that the file exists and provides the cache key.
+    try:
+        src_mtime = os.stat(CONFIG_PATH).st_mtime_ns
+    except FileNotFoundError:
         logger.error(f"Configuration file '{CONFIG_PATH}' not found.")
         raise FileNotFoundError(f"Configuration file '{CONFIG_PATH}' not found.")
+    cache_path = CONFIG_PATH + ".cache.json"
+
+    config = _read_config_cache(cache_path, src_mtime)
+    if config is not None:
+        logger.info(f"Configuration loaded from cache '{cache_path}'.")
+        return config
 
+    # PyYAML is only needed on a cache miss, so it is imported here rather than at module level.
+    import yaml
     try:
-        with open(CONFIG_PATH, 'r') as f:
-            config = yaml.safe_load(f) or {}
-            logger.info(f"Configuration loaded successfully from '{CONFIG_PATH}'.")
-            return config
+        from yaml import CSafeLoader as _Loader
+    except ImportError:  # PyYAML built without libyaml
+        from yaml import SafeLoader as _Loader
+
+    try:
+        # Read raw bytes and let the loader decode UTF-8 itself in a single pass.
+        with open(CONFIG_PATH, 'rb') as f:
+            data = f.read()
+        config = yaml.load(data, Loader=_Loader) or {}
+        logger.info(f"Configuration loaded successfully from '{CONFIG_PATH}'.")
     except yaml.YAMLError as e:
         logger.error(f"Error parsing YAML file '{CONFIG_PATH}': {e}")
         raise
@@ -30,39 +113,200 @@ def load_config():
         logger.error(f"Unexpected error loading configuration: {e}")
         raise
 
+    _write_config_cache(cache_path, src_mtime, config)
+    return config
+
+
+def server_sort_key(server_key: str):
+    """
+    Orders `serverN` keys by their number (server2 before server10); keys
+    without a numeric suffix come last, alphabetically.
+    """
+    suffix = server_key[len("server"):]
+    return (0, int(suffix), "") if suffix.isdigit() else (1, 0, suffix)
+
+
+def _group_servers_by_branch(servers_config) -> dict:
+    """
+    Maps each configured branch to the `serverN` entries that deploy it, in key
+    order (see server_sort_key), as (server_key, ServerConfig) pairs. An entry that fails validation
+    is kept as (server_key, error message) so it is reported when deployed.
+    """
+    index = {}
+    for server_key in sorted((key for key in servers_config if key.startswith("server")), key=server_sort_key):
+        server_info = servers_config[server_key]
+        try:
+            server = ServerConfig(**server_info)
+            branch = server.branch
+        except (ValidationError, TypeError) as e:
+            server = f"Invalid configuration for {server_key}: {e}"
+            branch = server_info.get("branch", "main") if isinstance(server_info, dict) else None
+        index.setdefault(branch, []).append((server_key, server))
+    return index
+
+
+@lru_cache(maxsize=1)
+def get_config() -> dict:
+    """
+    Returns the parsed configuration, loading it on first access.
+    Use reload_config() to force the file to be read again.
+    """
+    return load_config()
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Returns the loaded configuration validated against the Settings model,
+    so malformed values are reported at startup rather than mid-deploy.
+    """
+    try:
+        return Settings(**get_config())
+    except ValidationError as e:
+        logger.error(f"Invalid configuration: {e}")
+        raise
+
+
+@lru_cache(maxsize=1)
+def _settings() -> dict:
+    """
+    Extracts the essential settings from the loaded configuration and applies
+    the environment overrides for the email settings.
+    """
+    settings_model = get_settings()
+
+    NOTIFICATIONS = settings_model.notifications
+    EMAIL_SETTINGS = NOTIFICATIONS.get("email", {})
+
+    # Environment variables only override the YAML values when they are actually set.
+    for env_key, setting in _EMAIL_ENV_OVERRIDES:
+        if env_key in _ENV:
+            EMAIL_SETTINGS[setting] = _ENV[env_key]
+
+    smtp_port = _ENV["SMTP_PORT"] if "SMTP_PORT" in _ENV else EMAIL_SETTINGS.get('smtp_port', 587)
+    EMAIL_SETTINGS['smtp_port'] = int(smtp_port)
+    use_tls = _ENV["EMAIL_USE_TLS"] if "EMAIL_USE_TLS" in _ENV else EMAIL_SETTINGS.get('use_tls', True)
+    EMAIL_SETTINGS['use_tls'] = str(use_tls).lower() == "true"
 
-# Load the configuration file
-config = load_config()
+    if not all((EMAIL_SETTINGS.get('username'), EMAIL_SETTINGS.get('password'))):
+        logger.warning("Email username or password is missing. Email notifications may fail.")
+    if not EMAIL_SETTINGS.get('recipients'):
+        logger.warning("No email recipients configured. Email notifications will not be sent.")
 
-# Extract essential settings
-DEBUG_MODE = config.get("debug", False)  # <--- NEW
+    settings = {
+        "DEBUG_MODE": settings_model.debug,
+        "CONFIG_WATCH_INTERVAL": settings_model.config_watch_interval,
+        "WEBHOOK_SECRET": settings_model.github_webhook_secret,
+        # Mappings are exposed as read-only views; nothing mutates them after load.
+        "REPO_DEPLOY_MAP": MappingProxyType(settings_model.repo_deploy_map),
+        "BRANCH_INDEX": MappingProxyType({
+            repo_name: _group_servers_by_branch(servers_config)
+            for repo_name, servers_config in settings_model.repo_deploy_map.items()
+        }),
+        "DOCKER_COMPOSE_OPTIONS": settings_model.docker_compose_options,
+        "DOCKER_COMPOSE_PATH": settings_model.docker_compose_path,
+        "GIT_BRANCH": settings_model.git_branch,
+        "DEPLOY_API_KEY": settings_model.deploy_api_key,
+        "TESTS_API_KEY": settings_model.tests_api_key,
+        "NOTIFICATIONS": MappingProxyType(NOTIFICATIONS),
+        "SLACK_WEBHOOK": NOTIFICATIONS.get("slack_webhook_url", ""),
+        "EMAIL_SETTINGS": MappingProxyType(EMAIL_SETTINGS),
+    }
 
-WEBHOOK_SECRET = config.get("github_webhook_secret", "")
-REPO_DEPLOY_MAP = config.get("repo_deploy_map", {})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Git branch: %s", settings['GIT_BRANCH'])
+        logger.info("Docker compose path: %s", settings['DOCKER_COMPOSE_PATH'])
+        logger.info("Email SMTP Server: %s", EMAIL_SETTINGS.get('smtp_server'))
+        logger.info("Email Recipients: %s", orjson.dumps(EMAIL_SETTINGS.get('recipients')).decode())
+    return settings
 
-DOCKER_COMPOSE_OPTIONS = config.get("docker_compose_options", "up -d --build")
-DOCKER_COMPOSE_PATH = config.get("docker_compose_path", "docker-compose")
-GIT_BRANCH = config.get("git_branch", "main")
 
-DEPLOY_API_KEY = config.get("deploy_api_key", "")
-TESTS_API_KEY = config.get("tests_api_key", "")
+def reload_config():
+    """
+    Drops the cached configuration so the next access reads the file again.
+    """
+    get_config.cache_clear()
+    get_settings.cache_clear()
+    _settings.cache_clear()
+
+
+def watch_config(interval: float):
+    """
+    Starts a daemon thread that reloads the configuration whenever the config
+    file's mtime changes. Only the watcher touches the filesystem; request
+    handlers keep reading the cached settings. A file that fails to parse or
+    validate is logged and the previous configuration stays in effect.
+    """
+    def _mtime():
+        try:
+            return os.stat(_CONFIG_PATH).st_mtime_ns
+        except OSError:
+            return None
 
-NOTIFICATIONS = config.get("notifications", {})
-SLACK_WEBHOOK = NOTIFICATIONS.get("slack_webhook_url", "")
-EMAIL_SETTINGS = NOTIFICATIONS.get("email", {})
+    def _watch():
+        last_mtime = _mtime()
+        while True:
+            time.sleep(interval)
+            mtime = _mtime()
+            if mtime is None or mtime == last_mtime:
+                continue
+            last_mtime = mtime
+            try:
+                Settings(**load_config())
+            except Exception as e:
+                logger.error(f"Configuration change ignored: {e}")
+                continue
+            reload_config()
+            _settings()
+            logger.info(f"Configuration reloaded from '{_CONFIG_PATH}'.")
 
-EMAIL_SETTINGS['password'] = os.getenv("EMAIL_PASSWORD", EMAIL_SETTINGS.get('password'))
-EMAIL_SETTINGS['username'] = os.getenv("EMAIL_USERNAME", EMAIL_SETTINGS.get('username'))
-EMAIL_SETTINGS['smtp_server'] = os.getenv("SMTP_SERVER", EMAIL_SETTINGS.get('smtp_server'))
-EMAIL_SETTINGS['smtp_port'] = int(os.getenv("SMTP_PORT", EMAIL_SETTINGS.get('smtp_port', 587)))
-EMAIL_SETTINGS['use_tls'] = os.getenv("EMAIL_USE_TLS", str(EMAIL_SETTINGS.get('use_tls', True))).lower() == "true"
+    thread = threading.Thread(target=_watch, name="config-watcher", daemon=True)
+    thread.start()
+    logger.info(f"Watching '{_CONFIG_PATH}' for changes every {interval}s.")
+    return thread
 
-if not EMAIL_SETTINGS.get('username') or not EMAIL_SETTINGS.get('password'):
-    logger.warning("Email username or password is missing. Email notifications may fail.")
-if not EMAIL_SETTINGS.get('recipients'):
-    logger.warning("No email recipients configured. Email notifications will not be sent.")
 
-logger.info(f"Git branch: {GIT_BRANCH}")
-logger.info(f"Docker compose path: {DOCKER_COMPOSE_PATH}")
-logger.info(f"Email SMTP Server: {EMAIL_SETTINGS.get('smtp_server')}")
-logger.info(f"Email Recipients: {EMAIL_SETTINGS.get('recipients')}")
+def repo_deploy_map():
+    return _settings()["REPO_DEPLOY_MAP"]
+
+
+def branch_index(repo_name: str, servers_config) -> dict:
+    """
+    Returns the branch -> servers index of a repository, built once per
+    config load. If servers_config isn't the currently loaded mapping (it was
+    looked up before a reload), the index is built from it directly.
+    """
+    settings = _settings()
+    if settings["REPO_DEPLOY_MAP"].get(repo_name) is servers_config:
+        return settings["BRANCH_INDEX"][repo_name]
+    return _group_servers_by_branch(servers_config)
+
+
+def max_retries() -> int:
+    return get_settings().max_retries
+
+
+def webhook_secret() -> str:
+    return get_settings().github_webhook_secret
+
+
+def deploy_api_key() -> str:
+    return get_settings().deploy_api_key
+
+
+def tests_api_key() -> str:
+    return get_settings().tests_api_key
+
+
+def __getattr__(name: str):
+    """
+    Resolves the module-level settings (DEBUG_MODE, REPO_DEPLOY_MAP, ...) on
+    first access, so importing this module does not read the config file.
+    """
+    # `from config import ...` probes __path__; that must not load the settings.
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        return _settings()[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
@@ -1,19 +1,46 @@
 from fastapi import Header, HTTPException, status
+from functools import lru_cache
+import hmac
 import logging
-from config import DEPLOY_API_KEY, TESTS_API_KEY
+from config import deploy_api_key, tests_api_key
 
 logger = logging.getLogger(__name__)
 
+# Raised for every rejected key; the traceback is reset on each raise so it doesn't accumulate.
+_UNAUTHORIZED = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key")
 
-def get_deploy_api_key(api_key: str = Header(..., alias="X-API-Key")):
-    if api_key != DEPLOY_API_KEY:
-        logger.warning("Invalid API Key for manual deployment.")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key")
-    return api_key
+# Headers shorter than this (or than the configured key, if that is shorter) are
+# rejected without running the comparison. It sits below any real key length,
+# so it doesn't reveal anything about the configured key.
+_MIN_API_KEY_LENGTH = 16
 
 
-def get_tests_api_key(api_key: str = Header(..., alias="X-API-Key")):
-    if api_key != TESTS_API_KEY:
-        logger.warning("Invalid API Key for list-files or test-command.")
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API Key")
-    return api_key
+@lru_cache(maxsize=8)
+def _expected_key(key: str) -> bytes:
+    """
+    Encoded form of a configured API key, computed once per distinct key.
+    Kept out of the dependency signatures: FastAPI would expose any extra
+    parameter with a default value as a client-supplied query parameter.
+    """
+    return key.encode("utf-8")
+
+
+def _make_key_dep(get_expected, label: str):
+    """
+    Builds an X-API-Key dependency that checks the header against the key
+    returned by get_expected(), in constant time.
+    """
+    def dep(api_key: str = Header(..., alias="X-API-Key")):
+        expected = _expected_key(get_expected())
+        if (not api_key or len(api_key) < min(_MIN_API_KEY_LENGTH, len(expected))
+                or not hmac.compare_digest(api_key.encode("utf-8"), expected)):
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("Invalid API Key for %s.", label)
+            raise _UNAUTHORIZED.with_traceback(None)
+        return api_key
+
+    return dep
+
+
+get_deploy_api_key = _make_key_dep(deploy_api_key, "manual deployment")
+get_tests_api_key = _make_key_dep(tests_api_key, "list-files or test-command")
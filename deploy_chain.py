@@ -1,128 +1,360 @@
 import logging
 import os
+import re
+import select
+import shlex
 import time
-import paramiko
-from utils import run_command  # Removed restart_containers since we'll handle locally
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from circuit_breaker import get_breaker
+from config import branch_index, max_retries, server_sort_key
+from models.server_config import ServerConfig
+from ssh_pool import POOL
+from utils import OutputTail, retry, run_command  # Removed restart_containers since we'll handle locally
 
 logger = logging.getLogger(__name__)
 
-def deploy_chain(repo_name: str, push_branch: str, servers_config: dict, notifier):
+# Read size for SSH channel output.
+_SSH_RECV_BUFSIZE = 65536
+
+# Output lines quoted in the message of a failed remote command.
+_ERROR_TAIL_LINES = 20
+
+# Prepended to compose build commands. Passed through `env` so the variables
+# survive sudo's environment reset. COMPOSE_DOCKER_CLI_BUILD makes
+# docker-compose v1 build via BuildKit too.
+_BUILD_ENV = ["env", "DOCKER_BUILDKIT=1", "COMPOSE_DOCKER_CLI_BUILD=1"]
+
+# Pulls the images of all services up front; compose fetches them concurrently.
+# Services that are only built locally have nothing to pull, so their failures are ignored.
+_PULL_ARGS = ["pull", "--quiet", "--ignore-pull-failures"]
+
+# Failures of `compose down` that don't affect the deployment.
+_BENIGN_ERROR_RE = re.compile("|".join(map(re.escape, (
+    "No container found",
+    "No containers to remove",
+    "has active endpoints",
+))))
+
+# Added to git clone/fetch for servers with `shallow: true`.
+_SHALLOW_ARGS = ["--depth=1"]
+
+# ssh options for git remotes reached over SSH: consecutive git operations
+# on the same host (ls-remote, fetch, clone) share one multiplexed connection.
+# Only used when ~/.ssh exists (ssh can't create the control socket otherwise)
+# and GIT_SSH_COMMAND isn't already set.
+_GIT_SSH_COMMAND = "ssh -o ControlMaster=auto -o ControlPath=~/.ssh/webhookx-%C -o ControlPersist=120s"
+_REMOTE_GIT_ENV = (
+    f'if [ -z "$GIT_SSH_COMMAND" ] && [ -d ~/.ssh ]; then export GIT_SSH_COMMAND={shlex.quote(_GIT_SSH_COMMAND)}; fi'
+)
+
+# Default upper bound on servers deployed at once with `parallel: true`
+# (override per repository with `max_parallel`); stays well below sshd's
+# default MaxStartups (10 unauthenticated connections).
+_MAX_PARALLEL_SERVERS = 5
+
+# Upper bound on additional_terminal_tasks run at once with `parallel: true`.
+_MAX_PARALLEL_TASKS = 8
+
+# Printed by the sequential remote task script when a task fails (see run_remote_tasks).
+_TASK_FAILED_RE = re.compile(r"::webhookx-task-failed (\d+)::")
+
+# Failures of git fetch or compose pull/build that are usually gone on the next
+# attempt (registry hiccups, DNS or network blips); these steps are retried.
+_TRANSIENT_ERROR_RE = re.compile("|".join(map(re.escape, (
+    "TLS handshake timeout",
+    "i/o timeout",
+    "connection reset by peer",
+    "Connection timed out",
+    "Temporary failure in name resolution",
+    "Could not resolve host",
+    "503 Service Unavailable",
+    "502 Bad Gateway",
+    "toomanyrequests",
+    "rate limit",
+))), re.IGNORECASE)
+
+
+class TransientCommandError(RuntimeError):
     """
-    Iterates over server definitions in servers_config and deploys sequentially.
+    A remote command failed with output matching _TRANSIENT_ERROR_RE.
+    """
+
+
+# Problems of the host itself, which no new commit fixes.
+_HOST_FATAL_RE = re.compile(
+    r"no space left on device"
+    r"|permission denied while trying to connect to the docker daemon"
+    r"|cannot connect to the docker daemon",
+    re.IGNORECASE,
+)
+
+# Output that means a compose run is doomed; with fail_fast the command is
+# aborted as soon as one of these lines appears instead of when it exits.
+_FATAL_ERROR_RE = re.compile(
+    _HOST_FATAL_RE.pattern
+    + r"|\byaml: line \d+"
+    r"|yaml\.(?:scanner|parser)\.\w+Error",
+    re.IGNORECASE,
+)
+
+
+class DeployFatalError(RuntimeError):
+    """
+    A remote command was aborted on output matching _FATAL_ERROR_RE. Not
+    retried. host_level is set for _HOST_FATAL_RE matches, which open the
+    server's circuit breaker right away; a broken compose file only counts as
+    an ordinary failure, since the next push usually fixes it.
+    """
+
+    def __init__(self, message: str, host_level: bool = False):
+        super().__init__(message)
+        self.host_level = host_level
+
+
+# Probed host capabilities below are trusted for this many seconds, so installing
+# the compose plugin or granting sudo is picked up without a restart.
+_CAPS_TTL = 300
+
+# (host, user) -> compose command detected on that host ("docker compose" or "docker-compose").
+_COMPOSE_CACHE = {}
+
+# host -> `uname -s` output, used for the default sudo choice.
+_OS_CACHE = {}
+
+# (host, user) -> whether `sudo -n true` succeeded, for servers with `sudo: true`.
+_SUDO_CACHE = {}
+
+
+def _cache_get(cache: dict, key):
+    """
+    Returns the cached capability for key, or None if unknown or older than _CAPS_TTL.
+    """
+    entry = cache.get(key)
+    if entry is None or time.monotonic() - entry[1] > _CAPS_TTL:
+        return None
+    return entry[0]
+
+
+def _cache_put(cache: dict, key, value):
+    cache[key] = (value, time.monotonic())
+
+
+def deploy_chain(repo_name: str, push_branch: str, servers_config: dict, notifier, head: str = None):
+    """
+    Iterates over server definitions in servers_config and deploys them.
+    Servers are deployed sequentially in key order, unless the repository sets
+    `parallel: true`, in which case they are deployed concurrently.
     If `additional_tasks_only` is true in a server's config, skips all fetch/clone/docker-compose steps
     and executes only the additional_terminal_tasks.
+    head, the pushed commit if known, lets a new commit past an open circuit breaker.
     """
-    server_keys = sorted(servers_config.keys())
-    for server_key in server_keys:
-        if not server_key.startswith("server"):
-            logger.info(f"Skipping '{server_key}' as it's not a server definition.")
+    index = branch_index(repo_name, servers_config)
+
+    # Servers configured for other branches are reported in a single notification.
+    ignored = sorted(
+        (key for branch, entries in index.items() if branch != push_branch for key, _ in entries),
+        key=server_sort_key,
+    )
+    if ignored:
+        msg = f"Push branch '{push_branch}' does not match the configured branch of {', '.join(ignored)}. Skipping."
+        logger.info(msg)
+        notifier.notify_deploy_event(repo_name, push_branch, "ignored", msg)
+
+    servers = []
+    for server_key, server in index.get(push_branch, []):
+        if isinstance(server, str):
+            # Entry failed validation at config load; `server` holds the error.
+            logger.error(server)
+            notifier.notify_deploy_event(repo_name, push_branch, "failed", server)
             continue
+        servers.append((server_key, server))
 
-        server_info = servers_config[server_key]
-        logger.info(f"=== Deploying {server_key} for repo '{repo_name}' ===")
+    if not servers_config.get("parallel", False) or len(servers) < 2:
+        for server_key, server in servers:
+            _deploy_one(server_key, server, repo_name, push_branch, notifier, head)
+        return
 
-        # Check branch match
-        config_branch = server_info.get("branch", "main")
-        if push_branch != config_branch:
-            msg = (
-                f"Push branch '{push_branch}' does not match configured branch "
-                f"'{config_branch}'. Skipping {server_key}."
-            )
-            logger.info(msg)
-            notifier.notify_deploy_event(repo_name, push_branch, "ignored", msg)
-            continue
+    # parallel/max_parallel are validated at config load (models.settings.RepoOptions).
+    max_workers = min(servers_config.get("max_parallel") or _MAX_PARALLEL_SERVERS, len(servers))
+    logger.info(f"Deploying {len(servers)} servers for repo '{repo_name}', up to {max_workers} at a time.")
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="deploy") as executor:
+        futures = {
+            executor.submit(_deploy_one, server_key, server, repo_name, push_branch, notifier, head): server_key
+            for server_key, server in servers
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            logger.info(f"Parallel deployment of {futures[future]} for repo '{repo_name}' returned.")
+
+    summary = ", ".join(f"{key}: {'ok' if results[key] else 'failed'}" for key, _ in servers)
+    logger.info(f"Parallel deployment for repo '{repo_name}' finished ({summary}).")
+
+
+def _deploy_one(server_key: str, server: ServerConfig, repo_name: str, push_branch: str, notifier,
+                head: str = None):
+    """
+    Deploys a single server definition. Errors are logged and reported through
+    the notifier rather than raised, so one failing server doesn't stop the others.
+    Returns True if the server was deployed.
+    """
+    breaker = get_breaker(repo_name, server_key)
+    if not breaker.allow(head):
+        msg = (f"Skipping {server_key}: circuit open after {breaker.fail_count} failed deployment(s) "
+               f"of {head or 'this branch'} (next attempt in up to {breaker.recovery_s:.0f}s, "
+               f"or on a new commit).")
+        logger.warning(msg)
+        notifier.notify_deploy_event(repo_name, push_branch, "ignored", msg)
+        return False
 
-        try:
-            additional_tasks_only = server_info.get("additional_tasks_only", False)
-            target = server_info.get("target")
+    logger.info(f"=== Deploying {server_key} for repo '{repo_name}' ===")
 
-            # If additional_tasks_only is enabled, skip main deployment steps.
+    try:
+        additional_tasks_only = server.additional_tasks_only
+        target = server.target
+        tasks = server.tasks
+        parallel_tasks = server.parallel_tasks
+
+        if additional_tasks_only:
+            logger.info(f"additional_tasks_only is enabled for {server_key}; skipping fetch/clone/docker operations.")
+
+        if target == "remote":
+            # One SSH connection serves both the deployment and the additional tasks.
+            if not additional_tasks_only or tasks:
+                with _ssh_session(server) as ssh_client:
+                    if not additional_tasks_only:
+                        deploy_remote(ssh_client, server, repo_name, push_branch, notifier)
+                    if tasks:
+                        run_remote_tasks(ssh_client, tasks, server, notifier, repo_name, push_branch, parallel_tasks)
+        elif target == "local":
             if not additional_tasks_only:
-                if target == "local":
-                    deploy_local(server_info, repo_name, push_branch, notifier)
-                elif target == "remote":
-                    deploy_remote(server_info, repo_name, push_branch, notifier)
-                else:
-                    msg = f"Unknown target '{target}' for {server_key}. Skipping."
-                    logger.warning(msg)
-                    notifier.notify_deploy_event(repo_name, push_branch, "failed", msg)
-                    continue
-            else:
-                logger.info(f"additional_tasks_only is enabled for {server_key}; skipping fetch/clone/docker operations.")
-
-            # Execute additional tasks (if any)
-            tasks = server_info.get("additional_terminal_tasks", [])
+                deploy_local(server, repo_name, push_branch, notifier)
             if tasks:
-                if target == "local":
-                    run_local_tasks(tasks, server_info.get("deploy_dir"), notifier, repo_name, push_branch)
-                elif target == "remote":
-                    run_remote_tasks(tasks, server_info, notifier, repo_name, push_branch)
-                else:
-                    # When target is not specified, run tasks locally in the current working directory.
-                    run_local_tasks(tasks, os.getcwd(), notifier, repo_name, push_branch)
-
-            logger.info(f"=== Finished deployment for {server_key} ===\n")
-        except Exception as e:
-            logger.error(f"Deployment failed on {server_key}: {e}", exc_info=True)
-            notifier.notify_deploy_event(repo_name, push_branch, "failed", str(e))
-            # Optionally, decide whether to continue with other servers or abort.
-            # continue
+                run_local_tasks(tasks, server.deploy_dir, notifier, repo_name, push_branch, parallel_tasks)
+        elif not additional_tasks_only:
+            msg = f"Unknown target '{target}' for {server_key}. Skipping."
+            logger.warning(msg)
+            notifier.notify_deploy_event(repo_name, push_branch, "failed", msg)
+            breaker.record_failure(head)
+            return False
+        elif tasks:
+            # When target is not specified, run tasks locally in the current working directory.
+            run_local_tasks(tasks, os.getcwd(), notifier, repo_name, push_branch, parallel_tasks)
+
+        logger.info(f"=== Finished deployment for {server_key} ===\n")
+        breaker.record_success()
+        return True
+    except Exception as e:
+        logger.error(f"Deployment failed on {server_key}: {e}", exc_info=True)
+        notifier.notify_deploy_event(repo_name, push_branch, "failed", str(e))
+        if isinstance(e, DeployFatalError) and e.host_level:
+            breaker.trip(head)
+        else:
+            breaker.record_failure(head)
+        return False
 
 
 # ===================================================================
 # LOCAL DEPLOYMENT
 # ===================================================================
-def deploy_local(server_info, repo_name, push_branch, notifier):
+def deploy_local(server: ServerConfig, repo_name, push_branch, notifier):
     """
     Executes local deployment steps:
       1) Ensures the repository directory exists (or clones if allowed)
-      2) Pulls updates from git
+      2) Fetches the branch and fast-forwards if it moved
       3) Rebuilds containers if changes are detected or forced.
     """
-    deploy_dir = server_info.get("deploy_dir")
-    branch = server_info.get("branch", "main")
-    clone_url = server_info.get("clone_url")
-    create_dir = server_info.get("create_dir", False)
-    force_rebuild = server_info.get("force_rebuild", False)
-    use_sudo = server_info.get("sudo", False)
+    deploy_dir = server.deploy_dir
+    branch = server.branch
+    clone_url = server.clone_url
+    create_dir = server.create_dir
+    force_rebuild = server.force_rebuild
+    use_sudo = server.sudo
 
     try:
-        _ensure_local_repo(deploy_dir, clone_url, create_dir, branch)
+        _ensure_local_repo(deploy_dir, clone_url, create_dir, branch, server.shallow)
     except Exception as e:
         raise RuntimeError(f"Failed to ensure local repository at {deploy_dir}: {e}")
 
-    # Pull latest changes
-    git_pull_cmd = f"git pull origin {branch}"
-    out, err = run_command(git_pull_cmd, cwd=deploy_dir)
-    logger.info(f"Git pull output:\n{out}")
-    if err:
-        logger.warning(f"Git pull stderr:\n{err}")
+    # Fetch and fast-forward only if the branch moved
+    changed = _git_update_local(deploy_dir, branch, server.shallow)
 
     # Determine if rebuild is necessary
-    if "Already up to date." in out and not force_rebuild:
+    if not changed and not force_rebuild:
         logger.info("No changes found locally. Skipping docker-compose rebuild.")
     else:
         logger.info("Changes detected or forced rebuild. Starting container rebuild...")
 
-        docker_prefix = ""
+        docker_prefix = []
         if use_sudo:
             if _can_run_sudo_local():
-                docker_prefix = "sudo "
+                docker_prefix = ["sudo"]
             else:
                 logger.warning("Sudo requested but not available locally. Proceeding without sudo.")
 
-        down_cmd = f"cd {deploy_dir} && {docker_prefix}docker-compose down --remove-orphans"
-        logger.info(f"Running local down command: {down_cmd}")
-        run_command(down_cmd, cwd=deploy_dir)
+        # Pull and build while the old containers keep serving; `up` then only swaps them.
+        pull_cmd = docker_prefix + ["docker-compose"] + _PULL_ARGS
+        logger.info(f"Running local pull command: {shlex.join(pull_cmd)}")
+        run_command(pull_cmd, cwd=deploy_dir, log_label="Docker pull output")
+
+        build_cmd = docker_prefix + _BUILD_ENV + ["docker-compose", "build", "--pull"]
+        logger.info(f"Running local build command: {shlex.join(build_cmd)}")
+        run_command(build_cmd, cwd=deploy_dir, log_label="Docker build output")
 
-        up_cmd = f"cd {deploy_dir} && {docker_prefix}docker-compose up -d --build --remove-orphans"
-        logger.info(f"Running local up command: {up_cmd}")
-        run_command(up_cmd, cwd=deploy_dir)
+        if server.recreate_from_scratch:
+            # Only after the images are ready, so the services are down for stop + start alone.
+            down_cmd = docker_prefix + ["docker-compose", "down", "--remove-orphans"]
+            logger.info(f"Running local down command: {shlex.join(down_cmd)}")
+            run_command(down_cmd, cwd=deploy_dir)
+
+        up_cmd = docker_prefix + ["docker-compose", "up", "-d", "--remove-orphans"]
+        logger.info(f"Running local up command: {shlex.join(up_cmd)}")
+        run_command(up_cmd, cwd=deploy_dir, log_label="Docker up output")
 
     notifier.notify_deploy_event(repo_name, push_branch, "successful", "Local deployment completed.")
 
 
-def _ensure_local_repo(deploy_dir: str, clone_url: str, create_dir: bool, branch: str):
+def _git_update_local(deploy_dir: str, branch: str, shallow: bool = False) -> bool:
+    """
+    Fetches the branch and fast-forwards the working copy to it.
+    Returns True if HEAD moved, judged by commit ids rather than git's
+    (locale-dependent) output. The remote ref is checked with ls-remote
+    first, so nothing is fetched when the branch hasn't moved.
+    With shallow, only the branch tip is fetched and the working copy is
+    reset to it, discarding local changes.
+    """
+    git = ["git", "-C", deploy_dir]
+    env = _git_env()
+    before, _ = run_command(git + ["rev-parse", "HEAD"])
+    remote, _ = run_command(git + ["ls-remote", "origin", f"refs/heads/{branch}"], env=env)
+    if remote.split("\t", 1)[0] == before:
+        logger.info(f"Local repository at {deploy_dir} is already at {before[:12]}.")
+        return False
+
+    run_command(git + ["fetch", "--quiet"] + (_SHALLOW_ARGS if shallow else []) + ["origin", branch], env=env)
+    fetched, _ = run_command(git + ["rev-parse", "FETCH_HEAD"])
+    if before == fetched:
+        logger.info(f"Local repository at {deploy_dir} is already at {before[:12]}.")
+        return False
+
+    run_command(git + (["reset", "--hard", "--quiet"] if shallow else ["merge", "--ff-only"]) + ["FETCH_HEAD"])
+    after, _ = run_command(git + ["rev-parse", "HEAD"])
+    logger.info(f"Local repository at {deploy_dir} updated {before[:12]} -> {after[:12]}.")
+    return after != before
+
+
+def _git_env():
+    """
+    Environment for local git commands that talk to the remote. Connection
+    multiplexing needs OpenSSH's ControlMaster, which isn't available on Windows.
+    """
+    if os.name != "posix" or "GIT_SSH_COMMAND" in os.environ or not os.path.isdir(os.path.expanduser("~/.ssh")):
+        return None
+    return {**os.environ, "GIT_SSH_COMMAND": _GIT_SSH_COMMAND}
+
+
+def _ensure_local_repo(deploy_dir: str, clone_url: str, create_dir: bool, branch: str, shallow: bool = False):
     """
     Ensures that the local deployment directory exists. Clones if needed.
     """
@@ -145,9 +377,9 @@ def _ensure_local_repo(deploy_dir: str, clone_url: str, create_dir: bool, branch
         logger.info(f"Creating parent directory: {parent_dir}")
         os.makedirs(parent_dir, exist_ok=True)
 
-    clone_cmd = f"git clone --branch {branch} {clone_url} \"{deploy_dir}\""
-    logger.info(f"Cloning repository with command: {clone_cmd}")
-    run_command(clone_cmd, cwd=parent_dir or ".")
+    clone_cmd = ["git", "clone", "--branch", branch] + (_SHALLOW_ARGS if shallow else []) + [clone_url, deploy_dir]
+    logger.info(f"Cloning repository into {deploy_dir}")
+    run_command(clone_cmd, cwd=parent_dir or ".", env=_git_env())
 
 
 def _can_run_sudo_local():
@@ -156,7 +388,7 @@ def _can_run_sudo_local():
     Runs: sudo -n true
     """
     try:
-        run_command("sudo -n true")
+        run_command(["sudo", "-n", "true"])
         return True
     except Exception as e:
         logger.warning(f"Local sudo test failed: {e}")
@@ -166,104 +398,182 @@ def _can_run_sudo_local():
 # ===================================================================
 # REMOTE DEPLOYMENT
 # ===================================================================
-def deploy_remote(server_info, repo_name, push_branch, notifier):
-    """
-    Executes remote deployment steps via SSH:
-      1) Connects via SSH.
-      2) Ensures the repository exists on remote (cloning if allowed).
-      3) Pulls updates from git.
-      4) Rebuilds containers if changes are detected or forced.
-    """
-    host = server_info["host"]
-    port = server_info.get("port", 22)
-    user = server_info["user"]
-    branch = server_info.get("branch", "main")
-    deploy_dir = server_info["deploy_dir"]
-    clone_url = server_info.get("clone_url")
-    create_dir = server_info.get("create_dir", False)
-    force_rebuild = server_info.get("force_rebuild", False)
-    use_sudo = server_info.get("sudo", False)
-    key_type = server_info.get("key_type", "pem")
-    key_path = server_info["key_path"]
-
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+def deploy_remote(ssh_client, server: ServerConfig, repo_name, push_branch, notifier):
+    """
+    Executes remote deployment steps over an open SSH session (see _ssh_session):
+      1) Ensures the repository exists on remote (cloning if allowed).
+      2) Fetches the branch and fast-forwards if it moved.
+      3) Rebuilds containers if changes are detected or forced.
+    """
+    host = server.host
+    branch = server.branch
+    deploy_dir = server.deploy_dir
+    clone_url = server.clone_url
+    create_dir = server.create_dir
+    force_rebuild = server.force_rebuild
+    use_sudo = server.sudo
 
     try:
-        private_key = _load_private_key(key_type, key_path)
-        ssh_client.connect(
-            hostname=host,
-            port=port,
-            username=user,
-            pkey=private_key,
-            timeout=15
+        # One round trip for everything we need to know about the remote up front.
+        host_key = (host, server.user)
+        # The OS is only needed to pick a sudo default when `sudo` isn't configured,
+        # and sudo only needs checking when it is; either is probed once per host.
+        # If the checkout already exists, the same exec also fetches and
+        # fast-forwards it when the branch moved.
+        retries = _retries(server)
+        compose_bin = _cache_get(_COMPOSE_CACHE, host_key)
+        sudo_ok = _cache_get(_SUDO_CACHE, host_key)
+        os_type = _cache_get(_OS_CACHE, host)
+        probe = retry(
+            lambda: _probe_remote(
+                ssh_client, deploy_dir, compose_bin,
+                check_sudo=bool(use_sudo) and sudo_ok is None,
+                check_os=use_sudo is None and os_type is None,
+                git_update=_git_update_script(shlex.quote(deploy_dir), branch, server.shallow),
+            ),
+            retries, (TransientCommandError,), label=f"Remote probe and git update on {host}",
         )
-        logger.info(f"SSH connected to {host} as {user}")
+        if probe["os_type"] is not None:
+            os_type = probe["os_type"]
+            # An empty `uname -s` isn't worth remembering; probe again next time.
+            if os_type:
+                _cache_put(_OS_CACHE, host, os_type)
+        if probe["sudo_ok"] is not None:
+            sudo_ok = probe["sudo_ok"]
+            _cache_put(_SUDO_CACHE, host_key, sudo_ok)
 
         try:
-            _ensure_remote_repo(ssh_client, deploy_dir, clone_url, create_dir, branch)
+            _ensure_remote_repo(ssh_client, deploy_dir, clone_url, create_dir, branch, probe["dir_exists"],
+                                server.shallow)
         except Exception as repo_err:
             raise RuntimeError(f"Failed to ensure remote repository at {deploy_dir}: {repo_err}")
 
-        # Pull the latest changes
-        pull_cmd = f"cd {deploy_dir} && git pull origin {branch}"
-        pull_output = _exec_ssh_command(ssh_client, pull_cmd)
-        logger.info(f"Remote git pull output:\n{pull_output}")
+        changed = probe["git_changed"]
+        if changed is None:
+            # Freshly cloned; fetch and fast-forward only if the branch moved
+            changed = retry(
+                lambda: _git_update_remote(ssh_client, shlex.quote(deploy_dir), branch, server.shallow),
+                retries, (TransientCommandError,), label=f"Git update on {host}",
+            )
+        else:
+            logger.info(f"Remote git update: {'changes pulled' if changed else 'already up to date'}.")
 
         # Decide if we need to rebuild
-        do_rebuild = force_rebuild or ("Already up to date." not in pull_output)
-        docker_bin = _detect_docker_compose_binary(ssh_client)
+        do_rebuild = force_rebuild or changed
+        docker_bin = probe["compose_bin"]
+        if not docker_bin:
+            raise RuntimeError("Neither 'docker compose' nor 'docker-compose' found on the remote system.")
+        if docker_bin != compose_bin:
+            _cache_put(_COMPOSE_CACHE, host_key, docker_bin)
 
         docker_prefix = ""
         if use_sudo:
-            if _can_run_sudo_remote(ssh_client):
+            if sudo_ok:
                 docker_prefix = "sudo "
             else:
                 logger.warning("Sudo requested but not available remotely. Proceeding without sudo.")
-        else:
-            docker_prefix = _default_docker_prefix(ssh_client)
+        elif use_sudo is None:
+            # Default to sudo on Linux hosts, where docker usually needs it.
+            docker_prefix = "sudo " if "Linux" in (os_type or "") else ""
 
         if do_rebuild:
             logger.info("Changes detected or forced rebuild on remote. Rebuilding containers.")
-            down_cmd = f"cd {deploy_dir} && {docker_prefix}{docker_bin} down --remove-orphans"
-            _exec_ssh_command(ssh_client, down_cmd, allow_benign_errors=True)
-
-            up_cmd = f"cd {deploy_dir} && {docker_prefix}{docker_bin} up -d --build --remove-orphans"
-            rebuild_output = _exec_ssh_command(ssh_client, up_cmd)
-            logger.info(f"Docker rebuild output:\n{rebuild_output}")
+            # Pull and build while the old containers keep serving; `up` then only swaps them.
+            # The steps run in one exec; the echoed markers separate them in the log.
+            steps = [
+                ("pull", f"{docker_prefix}{docker_bin} {shlex.join(_PULL_ARGS)}"),
+                ("build", f"{docker_prefix}{shlex.join(_BUILD_ENV)} {docker_bin} build --pull"),
+            ]
+            up_step = ("up", f"{docker_prefix}{docker_bin} up -d --remove-orphans")
+            if server.recreate_from_scratch:
+                # `down` waits until the images are ready, so the services are
+                # only down for stop + start, not for the whole pull and build.
+                _run_compose_steps(ssh_client, deploy_dir, steps, host, retries)
+                down_cmd = f"{docker_prefix}{docker_bin} down --remove-orphans"
+                _exec_in(ssh_client, deploy_dir, down_cmd, allow_benign_errors=True)
+                _run_compose_steps(ssh_client, deploy_dir, [up_step], host, retries)
+            else:
+                _run_compose_steps(ssh_client, deploy_dir, steps + [up_step], host, retries)
         else:
-            logger.info("No changes detected remotely. Bringing up containers without rebuilding.")
-            up_cmd = f"cd {deploy_dir} && {docker_prefix}{docker_bin} up -d"
-            up_output = _exec_ssh_command(ssh_client, up_cmd)
-            logger.info(f"Docker up output:\n{up_output}")
+            compose = f"{docker_prefix}{docker_bin}"
+            if _all_services_running(ssh_client, deploy_dir, compose):
+                logger.info("No changes detected remotely and all services are running. Skipping docker-compose up.")
+            else:
+                logger.info("No changes detected remotely. Bringing up containers without rebuilding.")
+                _exec_in(ssh_client, deploy_dir, f"{compose} up -d", log_label="Docker up output", fail_fast=True)
 
         notifier.notify_deploy_event(repo_name, push_branch, "successful", f"Remote server {host} updated.")
     except Exception as e:
         logger.error(f"Remote deploy error on {host}: {e}", exc_info=True)
         notifier.notify_deploy_event(repo_name, push_branch, "failed", str(e))
         raise
-    finally:
-        ssh_client.close()
-        logger.info(f"SSH disconnected from {host}")
 
 
-def _load_private_key(key_type: str, key_path: str):
+def _run_compose_steps(ssh_client, deploy_dir: str, steps, host: str, retries: int):
     """
-    Loads a private key based on key type. Currently supports 'pem' and 'ppk'.
+    Runs (name, command) steps in deploy_dir as a single `&&` chain, retrying
+    the whole chain on transient failures. Output is streamed to the log with
+    an '=== name ===' marker before each step.
     """
-    key_type = key_type.lower()
-    if key_type in ("pem", "ppk"):
-        return paramiko.RSAKey.from_private_key_file(key_path)
-    raise ValueError(f"Unsupported key_type '{key_type}'. Use 'pem' or 'ppk'.")
+    chain_cmd = " && ".join(f"echo '=== {name} ===' && {cmd}" for name, cmd in steps)
+    retry(
+        lambda: _exec_in(ssh_client, deploy_dir, chain_cmd, log_label="Docker rebuild output", fail_fast=True),
+        retries, (TransientCommandError,), label=f"Rebuild on {host}",
+    )
 
 
-def _ensure_remote_repo(ssh_client, deploy_dir: str, clone_url: str, create_dir: bool, branch: str):
+def _all_services_running(ssh_client, deploy_dir: str, compose: str) -> bool:
+    """
+    Returns True if every service in the compose file has a running container,
+    in which case `up -d` would have nothing to do. Any error counts as False.
+    """
+    check_cmd = f"{compose} config --services && echo '---' && {compose} ps --services --filter status=running"
+    try:
+        output = _exec_in(ssh_client, deploy_dir, check_cmd, pty=compose.startswith("sudo "))
+    except RuntimeError as e:
+        logger.debug(f"Could not list running services: {e}")
+        return False
+    configured, sep, running = output.partition("---")
+    if not sep:
+        return False
+    configured = set(configured.split())
+    return bool(configured) and configured <= set(running.split())
+
+
+def _exec_in(ssh_client, cwd: str, cmd: str, **kwargs):
+    """
+    Runs cmd with cwd as the working directory; cwd is shell-quoted here, so
+    callers pass it verbatim. Keyword arguments go to _exec_ssh_command.
+    """
+    return _exec_ssh_command(ssh_client, f"cd {shlex.quote(cwd)} && {cmd}", **kwargs)
+
+
+def _retries(server: ServerConfig) -> int:
+    """
+    Retries for transient failures: the server's `retries`, else the global max_retries.
+    """
+    return server.retries if server.retries is not None else max_retries()
+
+
+@contextmanager
+def _ssh_session(server: ServerConfig):
+    """
+    Yields a connected SSH client for a server definition, borrowed from the
+    process-wide pool (see ssh_pool.py) and returned to it afterwards, or
+    closed if the block raised.
+    """
+    with POOL.connection(server.host, server.port, server.user, server.key_path, server.key_type,
+                         retries=_retries(server)) as ssh_client:
+        yield ssh_client
+
+
+def _ensure_remote_repo(ssh_client, deploy_dir: str, clone_url: str, create_dir: bool, branch: str,
+                        dir_exists: bool, shallow: bool = False):
     """
     Ensures that the remote deploy directory exists. Clones if needed.
+    dir_exists comes from _probe_remote.
     """
-    check_cmd = f'[ -d "{deploy_dir}" ] && echo "EXISTS" || echo "NOT_EXISTS"'
-    result = _exec_ssh_command(ssh_client, check_cmd).strip()
-    if result == "EXISTS":
+    if dir_exists:
         logger.info(f"Remote directory exists: {deploy_dir}")
         return
 
@@ -279,79 +589,116 @@ def _ensure_remote_repo(ssh_client, deploy_dir: str, clone_url: str, create_dir:
 
     parent_dir = os.path.dirname(deploy_dir)
     if parent_dir:
-        mk_cmd = f'mkdir -p "{parent_dir}"'
+        mk_cmd = f"mkdir -p {shlex.quote(parent_dir)}"
         logger.info(f"Creating remote parent directory: {parent_dir}")
-        _exec_ssh_command(ssh_client, mk_cmd)
+        _exec_ssh_command(ssh_client, mk_cmd, pty=False)
 
-    clone_cmd = f'cd "{parent_dir or "/"}" && git clone --branch {branch} {clone_url} "{deploy_dir}"'
-    logger.info(f"Cloning remote repository with command: {clone_cmd}")
-    _exec_ssh_command(ssh_client, clone_cmd)
+    clone_argv = ["git", "clone", "--branch", branch] + (_SHALLOW_ARGS if shallow else []) + [clone_url, deploy_dir]
+    clone_cmd = f"{_REMOTE_GIT_ENV} && {shlex.join(clone_argv)}"
+    logger.info(f"Cloning remote repository into {deploy_dir}")
+    _exec_ssh_command(ssh_client, clone_cmd, pty=False)
 
 
-def _default_docker_prefix(ssh_client) -> str:
+def _git_update_script(quoted_dir: str, branch: str, shallow: bool = False) -> str:
     """
-    Determines a default docker command prefix based on the remote OS.
-    Returns "sudo " for Linux if necessary.
+    Shell snippet (a subshell) performing the remote counterpart of
+    _git_update_local. Prints GIT=CHANGED or GIT=UNCHANGED; exits non-zero
+    if a git command fails.
     """
-    try:
-        os_type = _exec_ssh_command(ssh_client, "uname -s", timeout=5).strip()
-        return "sudo " if "Linux" in os_type else ""
-    except Exception:
-        return ""
-
-
-def _can_run_sudo_remote(ssh_client) -> bool:
+    git = f"git -C {quoted_dir}"
+    fetch_args = shlex.join(["--quiet"] + (_SHALLOW_ARGS if shallow else []) + ["origin", branch])
+    apply_cmd = "reset --hard --quiet" if shallow else "merge --ff-only --quiet"
+    return (
+        f"({_REMOTE_GIT_ENV} && "
+        f"BEFORE=$({git} rev-parse HEAD) && "
+        f"REMOTE=$({git} ls-remote origin {shlex.quote('refs/heads/' + branch)} | cut -f1) && "
+        f'if [ "$REMOTE" = "$BEFORE" ]; then echo GIT=UNCHANGED; exit 0; fi && '
+        f"{git} fetch {fetch_args} && "
+        f'if [ "$BEFORE" != "$({git} rev-parse FETCH_HEAD)" ]; then '
+        f"{git} {apply_cmd} FETCH_HEAD || exit 1; fi && "
+        f'if [ "$({git} rev-parse HEAD)" != "$BEFORE" ]; then echo GIT=CHANGED; else echo GIT=UNCHANGED; fi)'
+    )
+
+
+def _git_update_remote(ssh_client, quoted_dir: str, branch: str, shallow: bool = False) -> bool:
     """
-    Checks if sudo can run non-interactively on the remote machine.
-    Executes 'sudo -n true' remotely.
+    Runs _git_update_script as a single exec. Returns True if HEAD moved.
     """
-    try:
-        _exec_ssh_command(ssh_client, "sudo -n true", timeout=10, allow_benign_errors=True)
-        return True
-    except Exception as e:
-        logger.warning(f"Remote sudo test failed: {e}")
-        return False
+    output = _exec_ssh_command(ssh_client, _git_update_script(quoted_dir, branch, shallow), pty=False)
+    changed = "GIT=CHANGED" in (line.strip() for line in output.splitlines())
+    logger.info(f"Remote git update: {'changes pulled' if changed else 'already up to date'}.")
+    return changed
 
 
-def _detect_docker_compose_binary(ssh_client) -> str:
+def _probe_remote(ssh_client, deploy_dir: str, compose_bin: str = None, check_sudo: bool = False,
+                  check_os: bool = True, git_update: str = None) -> dict:
     """
-    Detects whether 'docker compose' or 'docker-compose' is available on the remote.
-    Returns the detected binary.
+    Collects the remote facts a deployment needs in a single SSH exec:
+      - whether deploy_dir exists
+      - the OS name (uname -s), if check_os
+      - which compose binary is available ('docker compose' preferred),
+        unless compose_bin is already known for this host
+      - whether sudo runs non-interactively ('sudo -n true'), if check_sudo
+      - with git_update (a _git_update_script snippet), if deploy_dir exists:
+        the result of running it
+    Each fact is printed as a KEY=value line, so the answers don't depend on
+    the order or number of checks.
+    Returns a dict with dir_exists, os_type, compose_bin (None if neither is
+    installed), sudo_ok and git_changed (None if not checked or run).
     """
-    try:
-        _exec_ssh_command(ssh_client, "which docker", timeout=5)
-        version_out = _exec_ssh_command(ssh_client, "docker compose version", timeout=5, allow_benign_errors=True)
-        if "Docker Compose version" in version_out:
-            return "docker compose"
-    except Exception as e:
-        logger.debug(f"'docker compose' not available: {e}")
-
-    try:
-        _exec_ssh_command(ssh_client, "which docker-compose", timeout=5)
-        return "docker-compose"
-    except Exception:
-        pass
-
-    raise RuntimeError("Neither 'docker compose' nor 'docker-compose' found on the remote system.")
+    quoted_dir = shlex.quote(deploy_dir)
+    checks = [f'if [ -d {quoted_dir} ]; then echo DIR=1; else echo DIR=0; fi']
+    if check_os:
+        checks.append('echo "OS=$(uname -s)"')
+    if not compose_bin:
+        checks.append(
+            'if docker compose version >/dev/null 2>&1; then echo "COMPOSE=docker compose"; '
+            'elif command -v docker-compose >/dev/null 2>&1; then echo COMPOSE=docker-compose; '
+            'else echo COMPOSE=; fi'
+        )
+    if check_sudo:
+        checks.append('if sudo -n true >/dev/null 2>&1; then echo SUDO=1; else echo SUDO=0; fi')
+    if git_update:
+        # stderr too, so a failure's message ends up in the output.
+        checks.append(f'if [ -d {quoted_dir} ]; then {git_update} 2>&1; echo "GIT_RC=$?"; fi')
+
+    # Only a sudo check may need a terminal (sudoers `requiretty`).
+    output = _exec_ssh_command(ssh_client, "; ".join(checks), pty=check_sudo)
+    facts = {}
+    for line in output.splitlines():
+        name, sep, value = line.strip().partition("=")
+        if sep and name in ("DIR", "OS", "COMPOSE", "SUDO", "GIT", "GIT_RC"):
+            facts[name] = value
+    if "DIR" not in facts or (check_os and "OS" not in facts):
+        raise RuntimeError(f"Unexpected remote probe output: {facts}")
+    if "GIT_RC" in facts and (facts["GIT_RC"] != "0" or "GIT" not in facts):
+        error = TransientCommandError if _TRANSIENT_ERROR_RE.search(output) else RuntimeError
+        raise error(f"Remote git update failed: {output}")
+
+    result = {
+        "dir_exists": facts["DIR"] == "1",
+        "os_type": facts.get("OS"),
+        "compose_bin": compose_bin or facts.get("COMPOSE") or None,
+        "sudo_ok": facts["SUDO"] == "1" if "SUDO" in facts else None,
+        "git_changed": facts["GIT"] == "CHANGED" if "GIT" in facts else None,
+    }
+    logger.debug(f"Remote probe result: {result}")
+    return result
 
 
 # ===================================================================
 # TASK EXECUTION
 # ===================================================================
-def run_local_tasks(tasks, cwd, notifier, repo_name, push_branch):
+def run_local_tasks(tasks, cwd, notifier, repo_name, push_branch, parallel=False):
     """
-    Executes a list of local commands sequentially.
+    Executes a list of local commands, sequentially unless parallel is set.
     """
-    for cmd in tasks:
+    def run_one(cmd):
         logger.info(f"Executing local task: {cmd}")
         try:
-            out, err = run_command(cmd, cwd=cwd)
-            if out.strip():
-                logger.info(f"Local task output:\n{out}")
-            else:
+            out, _ = run_command(cmd, cwd=cwd, log_label=f"Local task '{cmd}' output")
+            if not out.strip():
                 logger.info(f"Local task '{cmd}' returned no output.")
-            if err.strip():
-                logger.warning(f"Local task error output:\n{err}")
         except Exception as e:
             logger.error(f"Local task '{cmd}' failed: {e}", exc_info=True)
             notifier.notify_deploy_event(
@@ -359,71 +706,174 @@ def run_local_tasks(tasks, cwd, notifier, repo_name, push_branch):
             )
             raise
 
+    _run_tasks(run_one, tasks, parallel)
+
 
-def run_remote_tasks(tasks, server_info, notifier, repo_name, push_branch):
+def run_remote_tasks(ssh_client, tasks, server: ServerConfig, notifier, repo_name, push_branch, parallel=False):
     """
-    Executes a list of commands on a remote host via SSH and logs the output.
-    Now uses get_pty=True so sudo can be used without silently failing.
+    Executes a list of commands on a remote host over an open SSH session and logs the output.
+    Tasks run with a PTY, so sudo and other commands that want a terminal work.
+    With parallel set, each command runs on its own channel of the same connection.
+    Otherwise the commands run one after another in a single exec (see
+    _run_remote_task_script), each in its own login shell, so a `cd` or `exit`
+    in one task doesn't affect the next.
     """
-    host = server_info["host"]
-    port = server_info.get("port", 22)
-    user = server_info["user"]
-    key_path = server_info["key_path"]
-    key_type = server_info.get("key_type", "pem")
+    host = server.host
+    if not parallel and len(tasks) > 1:
+        _run_remote_task_script(ssh_client, tasks, host, notifier, repo_name, push_branch)
+        return
+
+    def run_one(cmd):
+        logger.info(f"Executing remote task on {host}: {cmd}")
+        try:
+            result = _exec_ssh_command(ssh_client, cmd, log_label=f"Remote task '{cmd}' output")
+            if not result.strip():
+                logger.info(f"Remote task '{cmd}' returned no output.")
+        except Exception as e:
+            logger.error(f"Remote task '{cmd}' failed on {host}: {e}", exc_info=True)
+            notifier.notify_deploy_event(
+                repo_name, push_branch, "failed", f"Remote task '{cmd}' failed: {e}"
+            )
+            raise
+
+    _run_tasks(run_one, tasks, parallel)
 
-    ssh_client = paramiko.SSHClient()
-    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+
+def _run_remote_task_script(ssh_client, tasks, host: str, notifier, repo_name, push_branch):
+    """
+    Runs tasks in order in one exec, stopping at the first failure. The
+    driver script runs under sh whatever the login shell is; each task is
+    handed to the login shell ($SHELL -c) as its own argument, so it is parsed
+    on its own, as a separate exec would. A failing task prints a
+    _TASK_FAILED_RE marker with its index before the script exits with the
+    task's status.
+    """
+    logger.info(f"Executing {len(tasks)} remote tasks on {host}: {', '.join(tasks)}")
+    script = "\n".join(
+        f"echo {shlex.quote(f'=== {cmd} ===')}\n"
+        f'"${{SHELL:-/bin/sh}}" -c {shlex.quote(cmd)} || '
+        f"{{ rc=$?; echo '::webhookx-task-failed {i}::'; exit $rc; }}"
+        for i, cmd in enumerate(tasks)
+    )
     try:
-        private_key = _load_private_key(key_type, key_path)
-        ssh_client.connect(hostname=host, port=port, username=user, pkey=private_key, timeout=15)
+        _exec_ssh_command(ssh_client, f"sh -c {shlex.quote(script)}", log_label="Remote tasks output",
+                          name="remote tasks")
+    except Exception as e:
+        failed = _TASK_FAILED_RE.findall(str(e))
+        if failed:
+            what = f"Remote task '{tasks[int(failed[-1])]}' failed"
+        else:
+            what = "Remote task script could not be parsed or run"
+        logger.error(f"{what} on {host}: {e}", exc_info=True)
+        notifier.notify_deploy_event(repo_name, push_branch, "failed", f"{what}: {e}")
+        raise
 
+
+def _run_tasks(run_one, tasks, parallel):
+    """
+    Calls run_one for each task. Sequential runs stop at the first failure;
+    parallel runs let every task finish, then raise the first failure.
+    """
+    if not parallel or len(tasks) < 2:
         for cmd in tasks:
-            logger.info(f"Executing remote task on {host}: {cmd}")
-            try:
-                result = _exec_ssh_command(ssh_client, cmd)
-                if result.strip():
-                    logger.info(f"Remote task '{cmd}' output:\n{result}")
-                else:
-                    logger.info(f"Remote task '{cmd}' returned no output.")
-            except Exception as e:
-                logger.error(f"Remote task '{cmd}' failed on {host}: {e}", exc_info=True)
-                notifier.notify_deploy_event(
-                    repo_name, push_branch, "failed", f"Remote task '{cmd}' failed: {e}"
-                )
-                raise
-    finally:
-        ssh_client.close()
-        logger.info(f"SSH disconnected from {host}")
-
-
-def _exec_ssh_command(ssh_client, cmd, timeout=30, allow_benign_errors=False):
-    """
-    Executes an SSH command using exec_command(..., get_pty=True) and returns stdout as a string.
+            run_one(cmd)
+        return
+
+    # Capped below the usual sshd MaxSessions (10) for remote tasks.
+    with ThreadPoolExecutor(max_workers=min(_MAX_PARALLEL_TASKS, len(tasks)), thread_name_prefix="task") as executor:
+        futures = [executor.submit(run_one, cmd) for cmd in tasks]
+    errors = [future.exception() for future in futures if future.exception()]
+    if errors:
+        raise errors[0]
+
+
+def _exec_ssh_command(ssh_client, cmd, timeout=30, allow_benign_errors=False, log_label=None, fail_fast=False,
+                      name=None, pty=True):
+    """
+    Executes an SSH command on a new session channel (with a PTY unless
+    pty=False) and returns stdout as a string.
 
     - If the command fails (non-zero exit), raises a RuntimeError unless
-      allow_benign_errors=True, in which case it only logs a warning.
-    - Using get_pty=True helps with 'sudo' and other commands that need a TTY.
+      allow_benign_errors=True and the output matches a known benign error
+      (see _BENIGN_ERROR_RE), in which case it only logs a warning.
+      Failures that look transient (see _TRANSIENT_ERROR_RE) raise
+      TransientCommandError so callers can retry them.
+    - The PTY helps with 'sudo' and other commands that need a TTY. Internal
+      probes and git commands pass pty=False: they need no terminal, and their
+      stderr then stays separate from the stdout that gets parsed.
     - Both stdout and stderr are captured; if there's content in stderr and
       exit_status != 0, we treat it as an error (unless allow_benign_errors).
+    - With log_label, output is logged as it arrives. Only the last lines of
+      each stream are kept, so long builds aren't held in memory.
+    - With fail_fast, the channel is closed and DeployFatalError raised as
+      soon as an output line matches _FATAL_ERROR_RE.
+    - name, if given, stands in for cmd in messages (for multi-line scripts).
     """
-    logger.debug(f"Executing SSH command (PTY): {cmd}")
-    # We enable get_pty so that sudo and other interactive commands can run
-    stdin, stdout, stderr = ssh_client.exec_command(cmd, timeout=timeout, get_pty=True)
+    logger.debug(f"Executing SSH command{' (PTY)' if pty else ''}: {cmd}")
+    # A bare session channel on the client's existing transport; the file
+    # wrappers SSHClient.exec_command adds aren't used by the read loop below.
+    chan = ssh_client.get_transport().open_session(timeout=timeout)
+    chan.settimeout(timeout)
+    # We enable a PTY so that sudo and other interactive commands can run.
+    # The PTY also makes remote tools line-buffer their output, so it streams as
+    # it's produced; TERM=dumb and a wide terminal keep progress output to plain
+    # lines instead of cursor-redrawn bars wrapped at 80 columns.
+    if pty:
+        chan.get_pty(term="dumb", width=200, height=50)
+    chan.exec_command(cmd)
+    cmd = name or cmd
 
     # It's good practice to close stdin if you don't plan to write to it
-    stdin.channel.shutdown_write()
-
-    # Wait for the command to complete
-    exit_status = stdout.channel.recv_exit_status()
-
-    out = stdout.read().decode("utf-8", errors="replace")
-    err = stderr.read().decode("utf-8", errors="replace")
+    chan.shutdown_write()
+
+    # Drain both streams while the command runs. Waiting for the exit status
+    # first can deadlock once the remote side fills the channel window.
+    out_tail = OutputTail(log_label)
+    err_tail = OutputTail(f"{log_label} (stderr)" if log_label else None)
+    while True:
+        select.select([chan], [], [], 1.0)
+        lines = []
+        while chan.recv_ready():
+            lines += out_tail.feed(chan.recv(_SSH_RECV_BUFSIZE))
+        while chan.recv_stderr_ready():
+            lines += err_tail.feed(chan.recv_stderr(_SSH_RECV_BUFSIZE))
+        if fail_fast:
+            fatal = next((line for line in lines if _FATAL_ERROR_RE.search(line)), None)
+            if fatal:
+                chan.close()
+                raise DeployFatalError(f"Command '{cmd}' aborted: {fatal.strip()}",
+                                       host_level=bool(_HOST_FATAL_RE.search(fatal)))
+        if chan.exit_status_ready() and not chan.recv_ready() and not chan.recv_stderr_ready():
+            break
+    exit_status = chan.recv_exit_status()
+    out_tail.close()
+    err_tail.close()
+
+    out = out_tail.text()
+    err = err_tail.text()
 
     logger.debug(f"Command '{cmd}' exit status: {exit_status}")
     if err.strip():
         logger.debug(f"Command '{cmd}' stderr:\n{err}")
 
-    if exit_status != 0 and not allow_benign_errors:
-        raise RuntimeError(f"Command '{cmd}' failed (exit {exit_status}): {err}")
+    if exit_status != 0:
+        # With a PTY, stderr arrives merged into stdout, so both are searched.
+        if allow_benign_errors and (_BENIGN_ERROR_RE.search(out) or _BENIGN_ERROR_RE.search(err)):
+            logger.warning(f"Command '{cmd}' exited with {exit_status}; ignoring benign error.")
+        elif _TRANSIENT_ERROR_RE.search(out) or _TRANSIENT_ERROR_RE.search(err):
+            raise TransientCommandError(f"Command '{cmd}' failed (exit {exit_status}): {_last_lines(err or out)}")
+        else:
+            raise RuntimeError(f"Command '{cmd}' failed (exit {exit_status}): {_last_lines(err or out)}")
 
     return out
+
+
+def _last_lines(text: str) -> str:
+    """
+    The end of a command's output for error messages, which go out in
+    notifications; the full output is already in the log.
+    """
+    lines = text.splitlines()
+    if len(lines) <= _ERROR_TAIL_LINES:
+        return text
+    return "\n".join(["..."] + lines[-_ERROR_TAIL_LINES:])
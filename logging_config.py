@@ -1,101 +1,162 @@
+import atexit
 import logging
+import logging.handlers
+import queue
 import sqlite3
 import os
+import threading
 from datetime import datetime
 
 LOG_DB_PATH = os.getenv("LOG_DB_PATH", "logs.db")
 MAX_LOG_ENTRIES = 10000  # Maximum number of log entries to keep
 
+_QUEUE_SIZE = 10000  # Records waiting for the writer thread; newer ones are dropped beyond this
+_BATCH_SIZE = 256  # Maximum records written per transaction
+_BATCH_WAIT = 0.05  # Seconds the writer waits for more records before committing a batch
+_CLOSE_TIMEOUT = 5  # Seconds close() waits for queued records to be written
+_STOP = object()
+
 
 class SQLiteHandler(logging.Handler):
     """
     Custom logging handler to store log messages in an SQLite database.
+
+    emit() only queues the record; a daemon thread writes queued records in
+    batches over one long-lived WAL connection, so logging never waits on
+    SQLite. Records are dropped if the queue is full.
     """
     def __init__(self, db_path=LOG_DB_PATH, max_entries=MAX_LOG_ENTRIES):
         super().__init__()
         self.db_path = db_path
         self.max_entries = max_entries
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
         self.create_table()
+        # Counted once here and tracked in Python afterwards.
+        self._count = self._conn.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+        self._queue = queue.Queue(maxsize=_QUEUE_SIZE)
+        self._writer = threading.Thread(target=self._drain, name="sqlite-log-writer", daemon=True)
+        self._writer.start()
 
     def create_table(self):
         """Creates the logs table if it doesn't exist."""
-        conn = sqlite3.connect(self.db_path)
-        try:
-            cursor = conn.cursor()
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    timestamp TEXT NOT NULL,
-                    level TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    module TEXT,
-                    exception TEXT
-                )
-                """
-            )
-            # Create an index on the id column to optimize deletion queries
-            cursor.execute(
-                """
-                CREATE INDEX IF NOT EXISTS idx_logs_id ON logs (id DESC)
-                """
+        cursor = self._conn.cursor()
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                timestamp TEXT NOT NULL,
+                level TEXT NOT NULL,
+                message TEXT NOT NULL,
+                module TEXT,
+                exception TEXT
             )
-            conn.commit()
-        finally:
-            conn.close()
+            """
+        )
+        # Create an index on the id column to optimize deletion queries
+        cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_logs_id ON logs (id DESC)
+            """
+        )
 
     def emit(self, record):
         """
-        Inserts a log record into the SQLite database and enforces max log entries.
+        Queues a log record for the writer thread.
+        """
+        try:
+            self._queue.put_nowait((
+                datetime.utcnow().isoformat(),
+                record.levelname,
+                record.getMessage(),
+                record.module,
+                # Formatted here: the console formats records later, on its own thread.
+                record.exc_text or (self._format_exception(record) if record.exc_info else None),
+            ))
+        except queue.Full:
+            pass
+        except Exception:
+            self.handleError(record)
+
+    def _format_exception(self, record) -> str:
+        return (self.formatter or logging.Formatter()).formatException(record.exc_info)
+
+    def _drain(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < _BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=_BATCH_WAIT))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is _STOP
+            if stop:
+                batch.pop()
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch):
+        """
+        Inserts a batch of rows in one transaction and enforces max log entries.
         """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # Prepare log data
-            log_entry = {
-                "timestamp": datetime.utcnow().isoformat(),
-                "level": record.levelname,
-                "message": record.getMessage(),
-                "module": record.module,
-                "exception": record.exc_text,
-            }
-
-            # Insert log into database
-            cursor.execute(
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
                 """
                 INSERT INTO logs (timestamp, level, message, module, exception)
-                VALUES (:timestamp, :level, :message, :module, :exception)
+                VALUES (?, ?, ?, ?, ?)
                 """,
-                log_entry
+                batch
             )
-
-            # Enforce maximum number of log entries
-            cursor.execute("SELECT COUNT(*) FROM logs")
-            count = cursor.fetchone()[0]
-            if count > self.max_entries:
-                # Calculate number of logs to delete
-                excess = count - self.max_entries
-                # Delete the oldest 'excess' logs
-                cursor.execute(
-                    """
-                    DELETE FROM logs
-                    WHERE id IN (
-                        SELECT id FROM logs
-                        ORDER BY id ASC
-                        LIMIT ?
-                    )
-                    """,
-                    (excess,)
+            self._count += len(batch)
+            if self._count > self.max_entries:
+                # Rows are only ever deleted from the oldest end, so ids are contiguous.
+                self._conn.execute(
+                    "DELETE FROM logs WHERE id <= (SELECT MAX(id) - ? FROM logs)",
+                    (self.max_entries,)
                 )
-                conn.commit()
-
-            conn.commit()
+                self._count = self.max_entries
+            self._conn.execute("COMMIT")
         except Exception as e:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
             # If logging to the database fails, print to stderr as a last resort
             print(f"Failed to log to SQLite database: {e}")
-        finally:
-            conn.close()
+
+    def close(self):
+        """
+        Writes the queued records and closes the connection.
+        """
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(_CLOSE_TIMEOUT)
+        if not self._writer.is_alive():
+            self._conn.close()
+        super().close()
+
+
+# debug_mode the root logger was last configured with (None until setup_logging runs).
+_configured_debug_mode = None
+
+# Delivers queued records to the console handler on a background thread.
+_listener = None
+
+
+def _stop_listener():
+    """
+    Delivers the records still queued and closes the listener's handlers.
+    """
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
 
 
 def setup_logging(debug_mode: bool):
@@ -104,14 +165,29 @@ def setup_logging(debug_mode: bool):
       - debug_mode=True : console & SQLite logs at DEBUG level.
       - debug_mode=False: console logs at INFO level, skip database logging
         (or set DB to CRITICAL if you still want only critical logs stored).
+
+    Console output goes through a QueueHandler whose QueueListener thread does
+    the writing, so logging calls don't wait on stderr. The SQLite handler is
+    attached directly: it already only queues records for its own writer thread.
+
+    Calling it again with the same debug_mode is a no-op, so the handlers
+    (and the SQLite table setup) are not rebuilt on repeated imports.
     """
+    global _configured_debug_mode, _listener
 
     # Get the root logger
     logger = logging.getLogger()
 
+    if _configured_debug_mode == debug_mode and logger.handlers:
+        return
+    _configured_debug_mode = debug_mode
+
     # Remove any existing handlers to avoid duplicate logs
     while logger.handlers:
-        logger.removeHandler(logger.handlers[0])
+        handler = logger.handlers[0]
+        logger.removeHandler(handler)
+        handler.close()
+    _stop_listener()
 
     # Set the base logger level according to debug_mode
     if debug_mode:
@@ -129,7 +205,10 @@ def setup_logging(debug_mode: bool):
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
     console_handler.setFormatter(console_formatter)
-    logger.addHandler(console_handler)
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
 
     # 2) SQLite handler
     # Option A: If debug_mode=False, skip adding the SQLite handler entirely
@@ -152,3 +231,6 @@ def setup_logging(debug_mode: bool):
         # sqlite_handler.setFormatter(sqlite_formatter)
         # logger.addHandler(sqlite_handler)
         pass
+
+
+atexit.register(_stop_listener)
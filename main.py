@@ -6,7 +6,7 @@ from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 from fastapi.staticfiles import StaticFiles
 
-from config import DEBUG_MODE
+from config import DEBUG_MODE, CONFIG_WATCH_INTERVAL, watch_config
 from logging_config import setup_logging
 
 # Routers
@@ -21,6 +21,9 @@ setup_logging(DEBUG_MODE)
 logger = logging.getLogger(__name__)
 logger.info("Starting the WebHookX application...")
 
+if CONFIG_WATCH_INTERVAL > 0:
+    watch_config(CONFIG_WATCH_INTERVAL)
+
 app = FastAPI(
     title="WebHookX",
     description="Automated GitHub Repository Deployment Tool with Multi-Server Chain",
@@ -5,3 +5,5 @@ from typing import Optional
 class DeployRequest(BaseModel):
     repository_full_name: str
     branch: Optional[str] = None
+    # Return right away and run the deployment after the response is sent.
+    background: bool = False
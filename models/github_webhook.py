@@ -1,7 +1,9 @@
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 class GitHubWebhook(BaseModel):
     ref: str
     repository: Dict[str, Any]
+    # SHA of the pushed head commit.
+    after: Optional[str] = None
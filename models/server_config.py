@@ -0,0 +1,67 @@
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Optional, Union
+
+
+class TerminalTasks(BaseModel):
+    """
+    Mapping form of additional_terminal_tasks: `{parallel: true, cmds: [...]}`
+    runs independent commands concurrently.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    parallel: bool = False
+    cmds: List[str] = []
+
+
+class ServerConfig(BaseModel):
+    """
+    One `serverN` entry of a repository in repo_deploy_map, parsed once per
+    deployment. Unknown keys are ignored.
+    """
+    model_config = ConfigDict(frozen=True)
+
+    target: Optional[str] = None
+    deploy_dir: Optional[str] = None
+    branch: str = "main"
+    clone_url: Optional[str] = None
+    create_dir: bool = False
+    force_rebuild: bool = False
+    recreate_from_scratch: bool = False
+    # Clone/fetch only the branch tip and reset the checkout to it.
+    shallow: bool = False
+    # Retries for transient SSH/git/registry failures; None uses the global max_retries.
+    retries: Optional[int] = None
+    # None: decide from the remote OS (sudo on Linux); local targets don't use sudo.
+    sudo: Optional[bool] = None
+    additional_tasks_only: bool = False
+    additional_terminal_tasks: Optional[Union[List[str], TerminalTasks]] = None
+
+    # Remote targets only
+    host: Optional[str] = None
+    port: int = 22
+    user: Optional[str] = None
+    key_type: str = "pem"
+    key_path: Optional[str] = None
+
+    @property
+    def tasks(self) -> List[str]:
+        tasks = self.additional_terminal_tasks
+        if isinstance(tasks, TerminalTasks):
+            return tasks.cmds
+        return tasks or []
+
+    @property
+    def parallel_tasks(self) -> bool:
+        return isinstance(self.additional_terminal_tasks, TerminalTasks) and self.additional_terminal_tasks.parallel
+
+    @model_validator(mode="after")
+    def _check_remote_fields(self):
+        if self.target == "remote":
+            required = ("host", "user", "key_path") if self.additional_tasks_only \
+                else ("host", "user", "key_path", "deploy_dir")
+            missing = [name for name in required if not getattr(self, name)]
+            if missing:
+                raise ValueError(f"remote target requires: {', '.join(missing)}")
+        if self.create_dir and not self.additional_tasks_only and not self.clone_url:
+            raise ValueError("create_dir requires clone_url")
+        return self
@@ -0,0 +1,43 @@
+from pydantic import BaseModel, PositiveInt, ValidationError, field_validator
+from typing import Dict, Any, Optional
+
+
+class RepoOptions(BaseModel):
+    """
+    Repository-level keys of a repo_deploy_map entry (next to its `serverN`
+    entries), checked when the configuration is loaded.
+    """
+    parallel: bool = False
+    # None: the default limit in deploy_chain.
+    max_parallel: Optional[PositiveInt] = None
+
+
+class Settings(BaseModel):
+    """
+    Typed view of config.yaml. Unknown top-level keys are ignored.
+    """
+    debug: bool = False
+    config_watch_interval: float = 0
+    github_webhook_secret: str = ""
+    repo_deploy_map: Dict[str, Dict[str, Any]] = {}
+    docker_compose_options: str = "up -d --build"
+    docker_compose_path: str = "docker-compose"
+    git_branch: str = "main"
+    max_retries: int = 3
+    deploy_api_key: str = ""
+    tests_api_key: str = ""
+    notifications: Dict[str, Any] = {}
+
+    @field_validator("repo_deploy_map")
+    @classmethod
+    def _check_repo_options(cls, repo_deploy_map):
+        checked = {}
+        for repo_name, servers_config in repo_deploy_map.items():
+            try:
+                options = RepoOptions(**{key: servers_config[key] for key in RepoOptions.model_fields
+                                         if key in servers_config})
+            except ValidationError as e:
+                raise ValueError(f"invalid options for repository '{repo_name}': {e}") from None
+            # Keep the coerced values, e.g. `max_parallel: "4"` -> 4.
+            checked[repo_name] = {**servers_config, **options.model_dump(exclude_unset=True)}
+        return checked
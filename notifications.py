@@ -1,23 +1,34 @@
+import atexit
+import os
 import smtplib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import yaml
 import logging
+from functools import lru_cache
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:  # PyYAML built without libyaml
+    _Loader = yaml.SafeLoader
+
+
 def load_config(path: str) -> dict:
     """
-    Load configuration from a YAML file.
+    Load configuration from a YAML file. The parsed file is reused until its
+    mtime changes.
     """
     try:
-        with open(path, 'r') as file:
-            config = yaml.safe_load(file)
-            logger.debug(f"Loaded config: {config}")
-            return config
+        return _load_config_file(path, os.stat(path).st_mtime_ns)
     except FileNotFoundError:
         logger.error(f"Configuration file '{path}' not found.")
     except yaml.YAMLError as e:
@@ -27,6 +38,28 @@ def load_config(path: str) -> dict:
     return {}
 
 
+@lru_cache(maxsize=8)
+def _load_config_file(path: str, mtime_ns: int) -> dict:
+    """
+    Parses a YAML file. mtime_ns is only part of the cache key, so an updated
+    file is parsed again.
+    """
+    with open(path, 'rb') as file:
+        config = yaml.load(file, Loader=_Loader)
+    logger.debug(f"Loaded config: {config}")
+    return config
+
+
+@lru_cache(maxsize=8)
+def get_notifier(config_path: str = 'config.yaml') -> "Notifications":
+    """
+    Returns a shared Notifications instance for config_path.
+    """
+    notifier = Notifications(config_path)
+    atexit.register(notifier.close)
+    return notifier
+
+
 class Notifications:
     def __init__(self, config_path: str = 'config.yaml'):
         self.config = load_config(config_path)
@@ -34,6 +67,14 @@ class Notifications:
         email_config = self.config.get('notifications', {}).get('email', {})
         self.email_enabled = bool(email_config)
 
+        # Kept open between notifications so a burst of them shares one TLS handshake.
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8,
+                                                 max_retries=Retry(total=2, backoff_factor=0.2)))
+        self._smtp = None
+        self._smtp_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notify")
+
         if self.email_enabled:
             self.smtp_server = email_config.get('smtp_server')
             self.smtp_port = email_config.get('smtp_port', 587)
@@ -58,7 +99,7 @@ class Notifications:
             return
         payload = {"text": message}
         try:
-            response = requests.post(self.slack_webhook_url, json=payload)
+            response = self._http.post(self.slack_webhook_url, json=payload, timeout=5)
             if response.status_code != 200:
                 logger.error(f"Failed to send Slack message. Code: {response.status_code}, Resp: {response.text}")
             else:
@@ -94,19 +135,14 @@ class Notifications:
             msg.attach(part2)
 
         try:
-            if self.smtp_port == 465:
-                server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port)
-            else:
-                server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10)
-                server.ehlo()
-                if self.use_tls:
-                    server.starttls()
-                    server.ehlo()
-
-            server.login(self.username, self.password)
-            server.send_message(msg)
+            with self._smtp_lock:
+                try:
+                    self._get_smtp().send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    # Dropped between the NOOP and the send; one fresh connection.
+                    self._smtp = None
+                    self._get_smtp().send_message(msg)
             logger.info(f"Email sent successfully to {self.recipients} with subject '{subject}'.")
-            server.quit()
         except smtplib.SMTPAuthenticationError as e:
             logger.error(f"SMTP Authentication Error: {e}")
         except smtplib.SMTPConnectError as e:
@@ -116,6 +152,68 @@ class Notifications:
         except Exception as e:
             logger.error(f"Unexpected error while sending email: {e}")
 
+    def _get_smtp(self):
+        """
+        Returns the open SMTP connection if it still answers NOOP, otherwise
+        connects and logs in again. Callers hold _smtp_lock.
+        """
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_smtp()
+
+        if self.smtp_port == 465:
+            server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=10)
+        else:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=10)
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+        try:
+            server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        return server
+
+    def _close_smtp(self):
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+
+    def close(self):
+        """
+        Closes the SMTP connection and the HTTP session.
+        """
+        with self._smtp_lock:
+            if self._smtp is not None:
+                self._close_smtp()
+        self._http.close()
+        self._executor.shutdown(wait=False)
+
+    def _send_all(self, message: str, subject: str, html_message: str):
+        """
+        Sends the Slack message and the email at the same time and returns
+        once both are done, so a notification takes the slower of the two
+        rather than their sum.
+        """
+        try:
+            slack = self._executor.submit(self.send_slack_message, message)
+        except RuntimeError:
+            # Interpreter shutdown (the notifier queue drains from atexit) refuses new futures.
+            self.send_slack_message(message)
+            slack = None
+        self.send_email(subject, message, html_message)
+        if slack is not None:
+            slack.result()
+
     def notify_webhook_event(self, event: str, repo: str, branch: str, pusher: str):
         """
         Notify about a webhook event (Slack + Email).
@@ -127,7 +225,6 @@ class Notifications:
             f"Pusher: {pusher}\n"
             f"Event: {event}"
         )
-        self.send_slack_message(message)
         subject = f"Webhook Event: {event} on {repo}"
         # Create an HTML version for better formatting.
         html_message = f"""
@@ -143,7 +240,7 @@ class Notifications:
           </body>
         </html>
         """
-        self.send_email(subject, message, html_message)
+        self._send_all(message, subject, html_message)
 
     def notify_deploy_event(self, repo: str, branch: str, status: str, details: Optional[str] = ""):
         """
@@ -160,7 +257,6 @@ class Notifications:
             f"Status: {status.capitalize()}\n"
             f"Details: {details}"
         )
-        self.send_slack_message(message)
         subject = f"Deploy Event: {status.capitalize()} on {repo}"
         # Create an HTML version for better formatting.
         html_message = f"""
@@ -176,7 +272,7 @@ class Notifications:
           </body>
         </html>
         """
-        self.send_email(subject, message, html_message)
+        self._send_all(message, subject, html_message)
 
 # # notifications.py
 #
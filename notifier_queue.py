@@ -0,0 +1,90 @@
+# notifier_queue.py
+
+import atexit
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Consecutive "successful" events for the same repo and branch arriving within
+# this many seconds of the first one are sent as a single message.
+_BATCH_WINDOW = 0.5
+
+# How long interpreter shutdown waits for queued notifications to go out.
+_DRAIN_TIMEOUT = 10
+
+_QUEUE = queue.Queue()
+_STOP = object()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+class QueuedNotifier:
+    """
+    Wraps a Notifications instance so notify_deploy_event() only enqueues the
+    event and returns immediately. A single daemon thread delivers the events
+    in order, so Slack/SMTP round trips don't add to deployment wall time.
+    """
+
+    def __init__(self, notifier):
+        self.notifier = notifier
+
+    def notify_deploy_event(self, repo: str, branch: str, status: str, details: str = ""):
+        _ensure_worker()
+        _QUEUE.put((self.notifier, repo, branch, status, details))
+
+    def __getattr__(self, name):
+        # Everything else (send_email, notify_webhook_event, ...) stays synchronous.
+        return getattr(self.notifier, name)
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run, name="notifier", daemon=True)
+            _worker.start()
+            atexit.register(_drain)
+
+
+def _run():
+    pending = None
+    while True:
+        item = pending if pending is not None else _QUEUE.get()
+        pending = None
+        if item is _STOP:
+            return
+        notifier, repo, branch, status, details = item
+
+        if status == "successful":
+            merged = [details]
+            deadline = time.monotonic() + _BATCH_WINDOW
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    nxt = _QUEUE.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is not _STOP and nxt[:4] == (notifier, repo, branch, "successful"):
+                    merged.append(nxt[4])
+                else:
+                    pending = nxt
+                    break
+            details = "\n".join(merged)
+
+        try:
+            notifier.notify_deploy_event(repo, branch, status, details)
+        except Exception as e:
+            logger.error(f"Failed to deliver {status} notification for {repo}: {e}")
+
+
+def _drain():
+    """
+    Lets the worker finish the queued notifications before the process exits,
+    waiting at most _DRAIN_TIMEOUT seconds.
+    """
+    _QUEUE.put(_STOP)
+    _worker.join(_DRAIN_TIMEOUT)
+    if _worker.is_alive():
+        logger.warning("Exiting with undelivered notifications still queued.")
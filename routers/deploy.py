@@ -1,31 +1,36 @@
 # deploy.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from dependencies import get_deploy_api_key
 from models.deploy_request import DeployRequest
-from config import REPO_DEPLOY_MAP
+from config import repo_deploy_map
 from deploy_chain import deploy_chain
 import logging
 from fastapi.responses import JSONResponse
 
-from notifications import Notifications
+from notifications import get_notifier
+from notifier_queue import QueuedNotifier
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-notifier = Notifications(config_path="config.yaml")
+notifier = QueuedNotifier(get_notifier("config.yaml"))
 
 
 @router.post("/deploy", summary="Manual Deployment Endpoint")
-def manual_deploy(deploy_request: DeployRequest, api_key: str = Depends(get_deploy_api_key)):
+def manual_deploy(deploy_request: DeployRequest, background_tasks: BackgroundTasks,
+                  api_key: str = Depends(get_deploy_api_key)):
     """
     Manually trigger the deployment chain for a given repository and branch.
+    With `background: true` the request returns right away and the chain runs
+    after the response is sent; the outcome is reported through notifications.
     """
     repo_full_name = deploy_request.repository_full_name
     requested_branch = deploy_request.branch
 
     logger.info(f"Manual deployment triggered for repo: {repo_full_name}, branch: {requested_branch}")
 
-    if repo_full_name not in REPO_DEPLOY_MAP:
+    deploy_map = repo_deploy_map()
+    if repo_full_name not in deploy_map:
         message = f"Repository '{repo_full_name}' not configured for deployment."
         notifier.notify_deploy_event(repo_full_name, requested_branch or "?", "failed", message)
         raise HTTPException(
@@ -33,16 +38,42 @@ def manual_deploy(deploy_request: DeployRequest, api_key: str = Depends(get_depl
             detail=message
         )
 
-    sub_config = REPO_DEPLOY_MAP[repo_full_name]
+    sub_config = deploy_map[repo_full_name]
+    if deploy_request.background:
+        background_tasks.add_task(_deploy_in_background, repo_full_name, requested_branch, sub_config)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content={"message": f"Deployment chain started for {repo_full_name}, branch: {requested_branch}"}
+        )
+
+    try:
+        _deploy_and_notify(repo_full_name, requested_branch, sub_config)
+        return {"message": f"Deployment chain completed for {repo_full_name}, branch: {requested_branch}"}
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            content={"detail": str(e)}
+        )
+
+
+def _deploy_and_notify(repo_full_name: str, requested_branch, sub_config: dict):
+    """
+    Runs the deployment chain and reports the outcome. Failures are logged,
+    notified and re-raised.
+    """
     # We pass the branch to the chain. If server config has a different branch, it might skip or ignore.
     try:
         deploy_chain(repo_full_name, requested_branch, sub_config, notifier)
         notifier.notify_deploy_event(repo_full_name, requested_branch or "?", "successful", "All servers deployed.")
-        return {"message": f"Deployment chain completed for {repo_full_name}, branch: {requested_branch}"}
     except Exception as e:
         logger.error(f"Manual deployment chain failed: {str(e)}")
         notifier.notify_deploy_event(repo_full_name, requested_branch or "?", "failed", str(e))
-        return JSONResponse(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            content={"detail": str(e)}
-        )
\ No newline at end of file
+        raise
+
+
+def _deploy_in_background(repo_full_name: str, requested_branch, sub_config: dict):
+    try:
+        _deploy_and_notify(repo_full_name, requested_branch, sub_config)
+    except Exception:
+        # Already logged and notified; nobody is waiting for the result.
+        pass
\ No newline at end of file
@@ -3,6 +3,8 @@
 from fastapi import APIRouter
 import logging
 
+from circuit_breaker import circuit_states
+
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
@@ -11,3 +13,12 @@ logger = logging.getLogger(__name__)
 def health_check():
     logger.info("Health check endpoint was called.")
     return {"status": "OK"}
+
+
+@router.get("/health/circuits", summary="Per-Server Circuit Breaker States")
+def circuits():
+    """
+    Servers whose deployments keep failing are skipped for a while (circuit
+    OPEN); this lists the state of every server deployed since startup.
+    """
+    return circuit_states()
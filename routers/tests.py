@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from dependencies import get_tests_api_key
-from config import REPO_DEPLOY_MAP
+from config import repo_deploy_map
 from utils import run_command
+from ssh_pool import load_private_key
 import paramiko
 import os
 import traceback
@@ -22,11 +23,11 @@ def test_command(api_key: str = Depends(get_tests_api_key)):
     """
     logger.info("Test command endpoint was called.")
     try:
-        git_command = "git --version"
+        git_command = ["git", "--version"]
         git_stdout, _ = run_command(git_command, cwd=os.getcwd())
         git_version = git_stdout if git_stdout else "No output"
 
-        docker_command = "docker-compose --version"
+        docker_command = ["docker-compose", "--version"]
         docker_stdout, _ = run_command(docker_command, cwd=os.getcwd())
         docker_version = docker_stdout if docker_stdout else "No output"
 
@@ -50,7 +51,7 @@ def test_command(api_key: str = Depends(get_tests_api_key)):
 @router.get("/test-servers", summary="Test connectivity for all servers")
 def test_servers(api_key: str = Depends(get_tests_api_key)):
     """
-    Iterates over ALL repos and their servers in REPO_DEPLOY_MAP,
+    Iterates over ALL repos and their servers in the repo deploy map,
     testing each one in turn (local or remote).
 
     Returns a JSON object like:
@@ -72,7 +73,7 @@ def test_servers(api_key: str = Depends(get_tests_api_key)):
     """
     results = {}
 
-    for repo_name, servers_config in REPO_DEPLOY_MAP.items():
+    for repo_name, servers_config in repo_deploy_map().items():
         repo_result = {}
         # servers_config might look like:
         # {
@@ -150,13 +151,8 @@ def _check_server_remote(server_info: dict):
     ssh_client = paramiko.SSHClient()
     ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-    # Load private key
-    if key_type.lower() == "pem":
-        private_key = paramiko.RSAKey.from_private_key_file(key_path)
-    elif key_type.lower() == "ppk":
-        private_key = paramiko.RSAKey.from_private_key_file(key_path)
-    else:
-        raise ValueError(f"Unsupported key_type '{key_type}'.")
+    # Load private key (cached; RSA, ECDSA or Ed25519)
+    private_key = load_private_key(key_type, key_path)
 
     try:
         ssh_client.connect(hostname=host, port=port, username=user, pkey=private_key, timeout=15)
@@ -207,13 +203,14 @@ def list_files(
     """
     logger.info(f"Listing files (local & remote) for '{repository_full_name}'")
 
-    if repository_full_name not in REPO_DEPLOY_MAP:
+    deploy_map = repo_deploy_map()
+    if repository_full_name not in deploy_map:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Repository '{repository_full_name}' not found in configuration."
         )
 
-    servers_config = REPO_DEPLOY_MAP[repository_full_name]
+    servers_config = deploy_map[repository_full_name]
     files_by_server = {}
 
     for server_key, server_info in servers_config.items():
@@ -287,13 +284,8 @@ def _list_remote_files(server_info: dict):
     ssh_client = paramiko.SSHClient()
     ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
-    # Load private key
-    if key_type.lower() == "pem":
-        private_key = paramiko.RSAKey.from_private_key_file(key_path)
-    elif key_type.lower() == "ppk":
-        private_key = paramiko.RSAKey.from_private_key_file(key_path)
-    else:
-        raise ValueError(f"Unsupported key_type '{key_type}'.")
+    # Load private key (cached; RSA, ECDSA or Ed25519)
+    private_key = load_private_key(key_type, key_path)
 
     file_list = []
     try:
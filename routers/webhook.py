@@ -5,20 +5,21 @@ import json
 from urllib.parse import parse_qs
 from fastapi import APIRouter, Request, Header, HTTPException, status
 from models.github_webhook import GitHubWebhook
-from notifications import Notifications
+from notifications import get_notifier
+from notifier_queue import QueuedNotifier
 from utils import verify_signature
-from config import REPO_DEPLOY_MAP
+from config import repo_deploy_map
 from deploy_chain import deploy_chain
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-notifier = Notifications(config_path="config.yaml")
+notifier = QueuedNotifier(get_notifier("config.yaml"))
 
 # Dictionary to track currently running tasks keyed by (repo_full_name, branch)
 running_tasks = {}
 
 
-async def run_deploy_chain(repo_full_name: str, push_branch: str, sub_config: dict):
+async def run_deploy_chain(repo_full_name: str, push_branch: str, sub_config: dict, head: str = None):
     """
     Runs the deployment chain in an executor to avoid blocking the event loop.
     """
@@ -31,7 +32,8 @@ async def run_deploy_chain(repo_full_name: str, push_branch: str, sub_config: di
             repo_full_name,
             push_branch,
             sub_config,
-            notifier
+            notifier,
+            head
         )
         # Notify only if deployment finished successfully.
         notifier.notify_deploy_event(
@@ -130,7 +132,8 @@ async def handle_webhook(
 
     logger.info(f"Received webhook for repo: {repo_full_name}, branch: {push_branch}")
 
-    if repo_full_name not in REPO_DEPLOY_MAP:
+    deploy_map = repo_deploy_map()
+    if repo_full_name not in deploy_map:
         message = f"Repository '{repo_full_name}' not configured for deployment."
         logger.warning(message)
         raise HTTPException(
@@ -138,7 +141,7 @@ async def handle_webhook(
             detail=message
         )
 
-    sub_config = REPO_DEPLOY_MAP[repo_full_name]
+    sub_config = deploy_map[repo_full_name]
 
     # 5. Check if the push branch is allowed for deployment (if configured).
     allowed_branches = sub_config.get("branches")
@@ -154,7 +157,7 @@ async def handle_webhook(
 
     # 7. Start the deployment chain as an asynchronous background task.
     key = (repo_full_name, push_branch)
-    task = asyncio.create_task(run_deploy_chain(repo_full_name, push_branch, sub_config))
+    task = asyncio.create_task(run_deploy_chain(repo_full_name, push_branch, sub_config, webhook.after))
     running_tasks[key] = task
 
     # 8. Respond immediately to GitHub.
@@ -0,0 +1,205 @@
+# ssh_pool.py
+
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+import paramiko
+
+from utils import retry
+
+logger = logging.getLogger(__name__)
+
+# Connection failures worth another attempt (sshd restarting, connection
+# reset, timeouts). Authentication failures are final.
+_TRANSIENT_CONNECT_ERRORS = (paramiko.ssh_exception.NoValidConnectionsError, socket.timeout,
+                             ConnectionError, EOFError)
+
+
+class SSHConnectionPool:
+    """
+    Process-wide pool of authenticated SSH clients keyed by
+    (host, port, user, key_path).
+
+    connection() hands out an idle client for the key (most recently used
+    first) or connects a new one, and puts it back when the block exits
+    normally. A client whose block raised, or whose transport died, is closed
+    instead of being returned.
+    Idle clients are closed by a daemon reaper after idle_timeout seconds.
+
+    At most max_handshakes_per_host new connections to one host are set up at
+    a time, since sshd's default MaxStartups (10:30:100) starts dropping
+    unauthenticated connections beyond 10, which parallel deployments and
+    concurrent webhooks could otherwise hit.
+    """
+
+    def __init__(self, idle_timeout: float = 300, reap_interval: float = 60, max_idle_per_key: int = 4,
+                 max_handshakes_per_host: int = 8):
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self.max_idle_per_key = max_idle_per_key
+        self.max_handshakes_per_host = max_handshakes_per_host
+        # key -> deque of (client, last_used)
+        self._idle = {}
+        # (host, port) -> semaphore bounding concurrent handshakes
+        self._handshakes = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    @contextmanager
+    def connection(self, host: str, port: int, user: str, key_path: str, key_type: str = "pem",
+                   retries: int = 0):
+        key = (host, port, user, key_path)
+        ssh_client = self._borrow(key)
+        if ssh_client is None:
+            with self._handshake_slot(host, port):
+                ssh_client = retry(
+                    lambda: _connect(host, port, user, key_path, key_type),
+                    retries, _TRANSIENT_CONNECT_ERRORS, label=f"SSH connect to {host}",
+                )
+        else:
+            logger.debug(f"Reusing SSH connection to {host} as {user}")
+        try:
+            yield ssh_client
+        except BaseException:
+            # The block may have left a channel half-read or aborted mid-command.
+            ssh_client.close()
+            raise
+        else:
+            self._return(key, ssh_client)
+
+    def _handshake_slot(self, host: str, port: int):
+        with self._lock:
+            slot = self._handshakes.get((host, port))
+            if slot is None:
+                slot = self._handshakes[(host, port)] = threading.BoundedSemaphore(self.max_handshakes_per_host)
+        return slot
+
+    def _borrow(self, key):
+        while True:
+            with self._lock:
+                idle = self._idle.get(key)
+                if not idle:
+                    return None
+                ssh_client, _ = idle.pop()
+            if _is_alive(ssh_client):
+                return ssh_client
+            ssh_client.close()
+
+    def _return(self, key, ssh_client):
+        if not _is_alive(ssh_client):
+            ssh_client.close()
+            logger.info(f"SSH connection to {key[0]} dropped.")
+            return
+        with self._lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.max_idle_per_key:
+                idle.append((ssh_client, time.monotonic()))
+                ssh_client = None
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, name="ssh-reaper", daemon=True)
+                self._reaper.start()
+        if ssh_client is not None:
+            ssh_client.close()
+
+    def close_all(self):
+        """
+        Closes every idle client. Borrowed clients are closed when returned
+        only if their transport has died, so this is meant for shutdown.
+        """
+        with self._lock:
+            idle = [ssh_client for clients in self._idle.values() for ssh_client, _ in clients]
+            self._idle.clear()
+        for ssh_client in idle:
+            ssh_client.close()
+
+    def _reap(self):
+        while True:
+            time.sleep(self.reap_interval)
+            expired = []
+            now = time.monotonic()
+            with self._lock:
+                for key, idle in self._idle.items():
+                    # Oldest entries sit at the left end.
+                    while idle and now - idle[0][1] > self.idle_timeout:
+                        expired.append((key, idle.popleft()[0]))
+            for key, ssh_client in expired:
+                ssh_client.close()
+                logger.info(f"SSH disconnected from {key[0]} (idle)")
+
+
+def _is_alive(ssh_client) -> bool:
+    """
+    Cheap liveness check: the transport must be active and accept an
+    SSH_MSG_IGNORE packet, which the server discards without replying.
+    """
+    transport = ssh_client.get_transport()
+    if transport is None or not transport.is_active():
+        return False
+    try:
+        transport.send_ignore()
+    except (paramiko.SSHException, OSError, EOFError):
+        return False
+    return True
+
+
+def _connect(host: str, port: int, user: str, key_path: str, key_type: str):
+    """
+    Opens a new SSH connection.
+    """
+    ssh_client = paramiko.SSHClient()
+    ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        private_key = load_private_key(key_type, key_path)
+        ssh_client.connect(
+            hostname=host,
+            port=port,
+            username=user,
+            pkey=private_key,
+            timeout=15,
+            banner_timeout=15,
+            auth_timeout=15,
+            compress=True,
+        )
+        transport = ssh_client.get_transport()
+        # Keep pooled connections alive through long builds and idle NAT timeouts.
+        transport.set_keepalive(15)
+        # Short commands (probes, git checks) shouldn't wait on Nagle's algorithm.
+        transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception:
+        ssh_client.close()
+        raise
+    logger.info(f"SSH connected to {host} as {user}")
+    return ssh_client
+
+
+def load_private_key(key_type: str, key_path: str):
+    """
+    Loads a private key based on key type. Currently supports 'pem' and 'ppk'.
+    The algorithm (RSA, ECDSA, Ed25519) is detected from the key file, and the
+    parsed key is reused until the file changes.
+    """
+    key_type = key_type.lower()
+    if key_type in ("pem", "ppk"):
+        return _load_private_key_file(key_path, os.stat(key_path).st_mtime_ns)
+    raise ValueError(f"Unsupported key_type '{key_type}'. Use 'pem' or 'ppk'.")
+
+
+@lru_cache(maxsize=32)
+def _load_private_key_file(key_path: str, mtime_ns: int):
+    """
+    Parses a private key file. mtime_ns is only part of the cache key, so an
+    updated key file is parsed again.
+    """
+    logger.debug(f"Loading private key from {key_path}")
+    return paramiko.PKey.from_path(key_path)
+
+
+POOL = SSHConnectionPool()
+atexit.register(POOL.close_all)
@@ -4,15 +4,22 @@ import hmac
 import hashlib
 import subprocess
 import logging
+import random
 import sys
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple, Type, TypeVar, Union
 
-from config import WEBHOOK_SECRET, DOCKER_COMPOSE_PATH, DOCKER_COMPOSE_OPTIONS
+from config import get_settings, webhook_secret
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 def verify_signature(request_body: bytes, signature: str) -> bool:
-    if not WEBHOOK_SECRET:
+    secret = webhook_secret()
+    if not secret:
         logger.debug("Webhook secret is disabled. Skipping signature verification.")
         return True
 
@@ -30,7 +37,7 @@ def verify_signature(request_body: bytes, signature: str) -> bool:
         logger.warning(f"Unsupported signature type: {sha_name}")
         return False
 
-    mac = hmac.new(WEBHOOK_SECRET.encode(), msg=request_body, digestmod=hashlib.sha256)
+    mac = hmac.new(secret.encode(), msg=request_body, digestmod=hashlib.sha256)
     is_valid = hmac.compare_digest(mac.hexdigest(), signature)
     if is_valid:
         logger.debug("Webhook signature verified successfully.")
@@ -40,13 +47,96 @@ def verify_signature(request_body: bytes, signature: str) -> bool:
     return is_valid
 
 
-def run_command(command: str, cwd: str):
+class OutputTail:
+    """
+    Collects streamed command output. Complete lines are logged as they arrive
+    (one record per received chunk) when a label is given, and only the last
+    max_lines are kept for the caller.
+    """
+    def __init__(self, label: Optional[str] = None, max_lines: int = 1024):
+        self.label = label
+        self.lines = deque(maxlen=max_lines)
+        self._pending = bytearray()
+
+    def feed(self, data: bytes) -> List[str]:
+        """
+        Adds received output; returns the lines it completed.
+        """
+        self._pending += data
+        end = self._pending.rfind(b"\n") + 1
+        return self._emit(end) if end else []
+
+    def close(self):
+        if self._pending:
+            self._emit(len(self._pending))
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def _emit(self, end: int):
+        chunk = bytes(self._pending[:end]).decode("utf-8", errors="replace").splitlines()
+        del self._pending[:end]
+        self.lines.extend(chunk)
+        if self.label and any(chunk):
+            logger.info(f"{self.label}:\n" + "\n".join(chunk))
+        return chunk
+
+
+def _stream_command(command: Union[str, List[str]], cwd: Optional[str], log_label: str, env: Optional[dict] = None):
+    """
+    Runs a command with stderr merged into stdout, logging output as it arrives.
+    Returns the output tail; raises CalledProcessError on a non-zero exit.
+    """
+    tail = OutputTail(log_label)
+    with subprocess.Popen(
+        command,
+        cwd=cwd,
+        shell=isinstance(command, str),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    ) as proc:
+        while True:
+            data = proc.stdout.read1(65536)
+            if not data:
+                break
+            tail.feed(data)
+        tail.close()
+        returncode = proc.wait()
+
+    output = tail.text()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, command, output=output, stderr="")
+    return output
+
+
+def run_command(command: Union[str, List[str]], cwd: Optional[str] = None, log_label: Optional[str] = None,
+                env: Optional[dict] = None):
+    """
+    Runs a command and returns its (stdout, stderr). A string is run through
+    the shell; an argv list is executed directly, without a shell. env, if
+    given, replaces the process environment.
+
+    With log_label, output (stderr merged into stdout) is logged as it arrives
+    and only its tail is returned, so long builds aren't held in memory.
+    """
     logger.debug(f"Executing command: {command} in {cwd}")
+    if log_label:
+        try:
+            return _stream_command(command, cwd, log_label, env), ""
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Command failed: {command} (exit {e.returncode})")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error during command execution: {str(e)}")
+            raise
+
     try:
         result = subprocess.run(
             command,
             cwd=cwd,
-            shell=True,
+            shell=isinstance(command, str),
+            env=env,
             check=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
@@ -72,15 +162,35 @@ def run_command(command: str, cwd: str):
         raise
 
 
+def retry(fn: Callable[[], T], retries: int, retry_on: Tuple[Type[BaseException], ...],
+          base: float = 0.5, cap: float = 8.0, label: str = "Operation") -> T:
+    """
+    Calls fn, retrying up to `retries` more times when it raises one of
+    retry_on. Before retry n (0-based) it sleeps a random time between 0 and
+    min(cap, base * 2**n) ("full jitter"), so servers failing together don't
+    retry in lockstep.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except retry_on as e:
+            if attempt == retries:
+                raise
+            delay = random.uniform(0, min(cap, base * 2 ** attempt))
+            logger.warning(f"{label} failed ({e}); retrying in {delay:.1f}s ({attempt + 1}/{retries}).")
+            time.sleep(delay)
+
+
 def get_docker_compose_command():
-    command = f"{DOCKER_COMPOSE_PATH} {DOCKER_COMPOSE_OPTIONS}"
+    settings = get_settings()
+    command = f"{settings.docker_compose_path} {settings.docker_compose_options}"
     if sys.platform.startswith("linux"):
         command = f"sudo {command}"
     return command
 
 
 def get_docker_compose_down_command():
-    base_cmd = DOCKER_COMPOSE_PATH
+    base_cmd = get_settings().docker_compose_path
     if sys.platform.startswith("linux"):
         base_cmd = f"sudo {base_cmd}"
     return f"{base_cmd} down --remove-orphans"